@@ -7,14 +7,77 @@ type SectionEntry = { course: RawGroupedCourse; section: RawSection }
 
 type CourseIndex = {
   allUICourses: UICourse[]
-  byCodeToSections: Map<string, SectionEntry[]>
-  byCodeSection: Map<string, SectionEntry>
   aggregatedByCode: Map<string, CourseDetails>
+  // Keyed by `${normalizedCode}#${normalizedSectionId}`
+  sectionDetails: (key: string) => CourseDetails | null
 }
 
+type DetailsRecord = Omit<CourseDetails, 'title' | 'code' | 'description'> & { head: number }
+
+// Precomputed by scripts/course_index.py; mirrors what buildIndex derives from courses.json
+type CourseIndexArtifact = {
+  version: number
+  term: string | null
+  courses: UICourse[]
+  heads: [string, string, string][]
+  details: Record<string, DetailsRecord>
+  sections: Record<string, DetailsRecord>
+}
+
+const COURSE_INDEX_VERSION = 1
+
 const cachedByTerm = new Map<string, CourseIndex>()
 
-async function loadCoursesBySchool(termId: string): Promise<Record<string, any>> {
+type CourseShard = {
+  school: string
+  program: string | null
+  path: string
+  bytes: number
+  sha256: string
+}
+
+type CoursesManifest = {
+  version: number
+  term: string
+  layout: 'school' | 'program'
+  shards: CourseShard[]
+}
+
+const manifestByTerm = new Map<string, Promise<CoursesManifest | null>>()
+
+// Sharded terms ship courses/manifest.json; monolithic terms only have courses.json
+export function loadCoursesManifest(termId: string): Promise<CoursesManifest | null> {
+  let pending = manifestByTerm.get(termId)
+  if (!pending) {
+    pending = $fetch<CoursesManifest>(`/data/${termId}/courses/manifest.json`)
+      .then((manifest) => (manifest && Array.isArray(manifest.shards) ? manifest : null))
+      .catch(() => null)
+    manifestByTerm.set(termId, pending)
+  }
+  return pending
+}
+
+async function loadShards(termId: string, shards: CourseShard[]): Promise<Record<string, any>> {
+  const payloads = await Promise.all(shards.map((shard) => $fetch(`/data/${termId}/courses/${shard.path}`)))
+  const coursesBySchool: Record<string, any> = {}
+  shards.forEach((shard, i) => {
+    const payload = payloads[i] || (shard.program == null ? {} : [])
+    if (shard.program == null) {
+      coursesBySchool[shard.school] = payload
+    } else {
+      const byProgram = coursesBySchool[shard.school] || (coursesBySchool[shard.school] = {})
+      byProgram[shard.program] = payload
+    }
+  })
+  return coursesBySchool
+}
+
+export async function loadCoursesBySchool(termId: string, schoolPrefix?: string): Promise<Record<string, any>> {
+  const manifest = await loadCoursesManifest(termId)
+  if (manifest) {
+    const shards = schoolPrefix ? manifest.shards.filter((s) => s.school === schoolPrefix) : manifest.shards
+    return loadShards(termId, shards)
+  }
   const data = await $fetch(`/data/${termId}/courses.json`)
   if (!data) {
     throw createError({ statusCode: 404, statusMessage: 'Courses not found for term' })
@@ -22,6 +85,55 @@ async function loadCoursesBySchool(termId: string): Promise<Record<string, any>>
   return (data || {}) as any
 }
 
+function expandDetails(artifact: CourseIndexArtifact, record: DetailsRecord): CourseDetails {
+  const { head, ...rest } = record
+  const [title, code, description] = artifact.heads[head] || ['', '', '']
+  return { title, code, description, ...rest }
+}
+
+async function loadIndexArtifact(termId: string): Promise<CourseIndex | null> {
+  const artifact = await $fetch<CourseIndexArtifact>(`/data/${termId}/course-index.json`).catch(() => null)
+  if (!artifact || artifact.version !== COURSE_INDEX_VERSION) return null
+  const aggregatedByCode = new Map<string, CourseDetails>()
+  for (const [code, record] of Object.entries(artifact.details || {})) {
+    aggregatedByCode.set(code, expandDetails(artifact, record))
+  }
+  const sections = artifact.sections || {}
+  return {
+    allUICourses: artifact.courses || [],
+    aggregatedByCode,
+    sectionDetails: (key) => {
+      const record = sections[key]
+      return record ? expandDetails(artifact, record) : null
+    },
+  }
+}
+
+function sectionEntryDetails(entry: SectionEntry): CourseDetails {
+  const course = entry.course
+  const sec = entry.section
+  return {
+    title: (course.title || '').toString().trim(),
+    code: (course.courseCode || '').toString().trim(),
+    description: (course.description || '').toString().trim(),
+    instructors: Array.from(new Set(sec.instructors || [])),
+    units: (() => {
+      const u = sec.units as any
+      if (u == null || u === '') return null
+      const n = typeof u === 'number' ? u : parseFloat((u || '').toString())
+      return Number.isFinite(n) ? n : null
+    })(),
+    enrolled: Number(sec.registered || 0),
+    capacity: Number(sec.total || 0),
+    times: sec.time ? [sec.time] : [],
+    locations: sec.location ? [sec.location] : [],
+    duplicatedCredits: Array.from(new Set(sec.duplicatedCredits || [])),
+    prerequisites: Array.from(new Set(sec.prerequisites || [])),
+    dClearance: !!sec.dClearance,
+    type: sec.type ?? null,
+  }
+}
+
 async function buildIndex(termId: string): Promise<CourseIndex> {
   const byKeyMerged = new Map<string, UICourse>()
   const byCodeToSections = new Map<string, SectionEntry[]>()
@@ -85,8 +197,9 @@ async function buildIndex(termId: string): Promise<CourseIndex> {
         const n = typeof u === 'number' ? u : parseFloat((u || '').toString())
         return Number.isFinite(n) ? n : null
       })(),
-      enrolled: Number(firstSection.registered || 0),
-      capacity: Number(firstSection.total || 0),
+      // Every entry, including the first, is summed in the loop below
+      enrolled: 0,
+      capacity: 0,
       times: firstSection.time ? [firstSection.time] : [],
       locations: firstSection.location ? [firstSection.location] : [],
       duplicatedCredits: Array.from(new Set(firstSection.duplicatedCredits || [])),
@@ -117,9 +230,11 @@ async function buildIndex(termId: string): Promise<CourseIndex> {
 
   return {
     allUICourses,
-    byCodeToSections,
-    byCodeSection,
     aggregatedByCode,
+    sectionDetails: (key) => {
+      const entry = byCodeSection.get(key)
+      return entry ? sectionEntryDetails(entry) : null
+    },
   }
 }
 
@@ -134,7 +249,7 @@ export async function ensureIndexAsync(termId?: string): Promise<CourseIndex> {
   const id = termId || '20261'
   const existing = cachedByTerm.get(id)
   if (existing) return existing
-  const built = await buildIndex(id)
+  const built = (await loadIndexArtifact(id)) || (await buildIndex(id))
   cachedByTerm.set(id, built)
   return built
 }
@@ -149,28 +264,5 @@ export function getSectionDetailsIndexed(code: string, sectionId: string, termId
   const idx = ensureIndex(termId)
   const c = normalizeCourseCode(code)
   const s = normalizeSectionId(sectionId)
-  const entry = idx.byCodeSection.get(`${c}#${s}`)
-  if (!entry) return null
-  const course = entry.course
-  const sec = entry.section
-  return {
-    title: (course.title || '').toString().trim(),
-    code: (course.courseCode || '').toString().trim(),
-    description: (course.description || '').toString().trim(),
-    instructors: Array.from(new Set(sec.instructors || [])),
-    units: (() => {
-      const u = sec.units as any
-      if (u == null || u === '') return null
-      const n = typeof u === 'number' ? u : parseFloat((u || '').toString())
-      return Number.isFinite(n) ? n : null
-    })(),
-    enrolled: Number(sec.registered || 0),
-    capacity: Number(sec.total || 0),
-    times: sec.time ? [sec.time] : [],
-    locations: sec.location ? [sec.location] : [],
-    duplicatedCredits: Array.from(new Set(sec.duplicatedCredits || [])),
-    prerequisites: Array.from(new Set(sec.prerequisites || [])),
-    dClearance: !!sec.dClearance,
-    type: sec.type ?? null,
-  }
+  return idx.sectionDetails(`${c}#${s}`)
 }
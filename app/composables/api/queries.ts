@@ -1,6 +1,6 @@
 // Dynamic term-aware data loaded from public folder at runtime
 import { useTermId } from '@/composables/useTermId'
-import { ensureIndexAsync, getAggregatedCourseDetails, getSectionDetailsIndexed } from './indexer'
+import { ensureIndexAsync, getAggregatedCourseDetails, getSectionDetailsIndexed, loadCoursesBySchool } from './indexer'
 import type { CourseDetails, RawGroupedCourse, UICourse } from '../api/types'
 import { mapGroupedToUICourse, mergeSectionsById } from '../api/mappers'
 // removed duplicate imports from indexer
@@ -27,7 +27,7 @@ export async function getSchoolCourses(schoolPrefix: string, programPrefix: stri
   if (!schoolPrefix || !programPrefix) return []
   try {
     const { termId } = useTermId()
-    const coursesBySchool = await fetchCoursesBySchool(termId.value)
+    const coursesBySchool = await fetchCoursesBySchool(termId.value, schoolPrefix)
     const byProgram = (coursesBySchool as Record<string, any>)[schoolPrefix]
     if (!byProgram) return []
     const list: RawGroupedCourse[] = (byProgram as Record<string, RawGroupedCourse[]>)[programPrefix] || []
@@ -70,10 +70,9 @@ export async function getSectionDetails(courseCode: string, sectionId: string):
   return getSectionDetailsIndexed(courseCode, sectionId, termId.value)
 }
 
-async function fetchCoursesBySchool(termId: string): Promise<Record<string, any>> {
+async function fetchCoursesBySchool(termId: string, schoolPrefix?: string): Promise<Record<string, any>> {
   try {
-    const data = await $fetch(`/data/${termId}/courses.json`)
-    return (data || {}) as any
+    return await loadCoursesBySchool(termId, schoolPrefix)
   } catch {
     throw createError({ statusCode: 404, statusMessage: 'Courses not found for term' })
   }
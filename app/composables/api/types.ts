@@ -28,6 +28,8 @@ export type RawSection = {
   registered?: number | null
   location?: string | null
   time?: string | null
+  // Every meeting as [dayMask (bit 0 = Sunday), startMinutes, endMinutes]
+  meetings?: [number, number, number][]
   duplicatedCredits?: string[]
   prerequisites?: string[]
   dClearance?: boolean
@@ -1,6 +1,87 @@
 import type { UICourse } from '@/composables/api/types'
+import { normalizeCourseCode } from '@/utils/normalize'
 import { normalizeString } from './normalize'
 
+// Trigram index emitted by scripts/search_index.py: gram -> delta-encoded ids into `keys`
+type SearchIndexArtifact = {
+  version: number
+  term: string | null
+  gramSize: number
+  keys: string[]
+  grams: Record<string, number[]>
+}
+
+export type SearchIndex = {
+  gramSize: number
+  keys: string[]
+  grams: Record<string, number[]>
+  decoded: Map<string, Uint32Array>
+}
+
+const SEARCH_INDEX_VERSION = 1
+const searchIndexByTerm = new Map<string, Promise<SearchIndex | null>>()
+
+export function loadSearchIndex(termId: string): Promise<SearchIndex | null> {
+  let pending = searchIndexByTerm.get(termId)
+  if (!pending) {
+    pending = $fetch<SearchIndexArtifact>(`/data/${termId}/search-index.json`)
+      .then((artifact) => {
+        if (!artifact || artifact.version !== SEARCH_INDEX_VERSION) return null
+        return { gramSize: artifact.gramSize, keys: artifact.keys || [], grams: artifact.grams || {}, decoded: new Map() }
+      })
+      .catch(() => null)
+    searchIndexByTerm.set(termId, pending)
+  }
+  return pending
+}
+
+function postings(index: SearchIndex, gram: string): Uint32Array {
+  const cached = index.decoded.get(gram)
+  if (cached) return cached
+  const deltas = index.grams[gram] || []
+  const ids = new Uint32Array(deltas.length)
+  let current = 0
+  for (let i = 0; i < deltas.length; i++) {
+    current += deltas[i] || 0
+    ids[i] = current
+  }
+  index.decoded.set(gram, ids)
+  return ids
+}
+
+export function searchKey(course: UICourse): string {
+  return `${normalizeCourseCode(course.code)}::${(course.title || '').toString().trim().toUpperCase()}`
+}
+
+// Keys of courses that may match `search`, or null when the index cannot narrow it down
+// (no index loaded, a query shorter than one gram, or a non-ASCII query: the index only
+// holds ASCII trigrams). Candidates still need courseMatchesSearch.
+export function searchCandidates(index: SearchIndex | null, search: string): Set<string> | null {
+  const s = normalizeString(search)
+  if (!index || s.length < index.gramSize || /[\u0080-\uffff]/.test(s)) return null
+  const grams = new Set<string>()
+  for (let i = 0; i + index.gramSize <= s.length; i++) grams.add(s.slice(i, i + index.gramSize))
+  const lists = Array.from(grams, (g) => postings(index, g)).sort((a, b) => a.length - b.length)
+  let ids: ArrayLike<number> = lists[0] || []
+  for (let l = 1; l < lists.length && ids.length > 0; l++) {
+    const other = lists[l] as Uint32Array
+    const next: number[] = []
+    let j = 0
+    for (let i = 0; i < ids.length; i++) {
+      const id = ids[i] as number
+      while (j < other.length && (other[j] as number) < id) j++
+      if (j < other.length && other[j] === id) next.push(id)
+    }
+    ids = next
+  }
+  const keys = new Set<string>()
+  for (let i = 0; i < ids.length; i++) {
+    const key = index.keys[ids[i] as number]
+    if (key) keys.add(key)
+  }
+  return keys
+}
+
 export function courseMatchesSearch(course: UICourse, search: string): boolean {
   const s = normalizeString(search)
   if (!s) return true
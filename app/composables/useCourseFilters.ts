@@ -1,11 +1,11 @@
-import { computed, reactive, watch } from 'vue'
+import { computed, reactive, shallowRef, watch } from 'vue'
 import type { Ref } from 'vue'
 import type { UICourse, UICourseSection } from '~/composables/useAPI'
 import { useStore } from '~/composables/useStore'
 import { useTermId } from '@/composables/useTermId'
 import { parseUnitsToNumber } from '@/composables/filters/units'
 import { normalizeString, normalizeSectionType } from '@/composables/filters/normalize'
-import { courseMatchesSearch } from '@/composables/filters/search'
+import { courseMatchesSearch, loadSearchIndex, searchCandidates, searchKey, type SearchIndex } from '@/composables/filters/search'
 import { sectionMatchesEnrollment, type EnrollmentFilter } from '@/composables/filters/enrollment'
 import { sectionMatchesScheduleFilters, sectionMatchesTriState } from '@/composables/filters/schedule'
 
@@ -59,7 +59,10 @@ function someSectionMatches(
   return false
 }
 
-export function useCourseFilters(courses?: Ref<UICourse[]>) {
+// `indexed` marks lists built straight from the term's courses (all-courses and program views),
+// whose code+title keys and sections match the search index. Other lists, such as the
+// scheduled courses, are always scanned in full.
+export function useCourseFilters(courses?: Ref<UICourse[]>, indexed?: Ref<boolean>) {
   const { checkScheduleCollision } = useStore()
   const { termId } = useTermId()
 
@@ -80,6 +83,22 @@ export function useCourseFilters(courses?: Ref<UICourse[]>) {
     sectionTypes: [],
   })
 
+  // Prebuilt trigram index for the term, fetched the first time a search is typed
+  const searchIndex = shallowRef<SearchIndex | null>(null)
+  let searchIndexTerm: string | null = null
+  watch(
+    () => [termId.value, !!filters.searchText] as const,
+    ([term, searching]) => {
+      if (!searching || searchIndexTerm === term) return
+      searchIndexTerm = term
+      searchIndex.value = null
+      void loadSearchIndex(term).then((index) => {
+        if (searchIndexTerm === term) searchIndex.value = index
+      })
+    },
+    { immediate: true }
+  )
+
   const compileSectionPredicate = () => {
     const typesSet = new Set((filters.sectionTypes || []).map((t) => normalizeSectionType(t)))
     const hasUnitsFilter = filters.unitsMin != null || filters.unitsMax != null
@@ -175,7 +194,10 @@ export function useCourseFilters(courses?: Ref<UICourse[]>) {
   const apply = (list: UICourse[]): UICourse[] => {
     if (!list || list.length === 0) return []
     const out: UICourse[] = []
+    const candidates = indexed?.value ? searchCandidates(searchIndex.value, filters.searchText) : null
     for (const course of list) {
+      // The index only narrows the list; candidates are still confirmed by the substring check
+      if (candidates && !candidates.has(searchKey(course))) continue
       if (!courseMatchesSearch(course, filters.searchText)) continue
       if (!courseMatchesLevel(course, filters.courseLevelMin, filters.courseLevelMax)) continue
       const passingSections = filterSectionsForCourse(course)
@@ -1,4 +1,5 @@
 import { onMounted } from 'vue'
+import { useTermId } from '@/composables/useTermId'
 
 type RawProfessor = {
   id?: number
@@ -20,6 +21,15 @@ export type Professor = {
 
 type ProfessorsByName = Record<string, RawProfessor>
 
+// Written by scripts/ratings_index.py: only the term's instructors, keyed by normalizeKey(instructor)
+type TermRatings = {
+  version: number
+  term: string | null
+  ratings: ProfessorsByName
+}
+
+const TERM_RATINGS_VERSION = 1
+
 function normalizeWhitespace(input: string): string {
   return input.trim().replace(/\s+/g, ' ')
 }
@@ -65,16 +75,39 @@ async function loadProfessorsJSON(): Promise<ProfessorsByName> {
   return data || {}
 }
 
+async function loadTermRatings(termId: string): Promise<ProfessorsByName | null> {
+  if (!process.client) return null
+  const res = await fetch(`/data/${termId}/ratings.json`, { cache: 'force-cache' }).catch(() => null)
+  if (!res || !res.ok) return null
+  const data = (await res.json().catch(() => null)) as TermRatings | null
+  if (!data || data.version !== TERM_RATINGS_VERSION || !data.ratings) return null
+  return data.ratings
+}
+
 export function useRMPRatings() {
+  const { termId } = useTermId()
   const rawData = useState<ProfessorsByName>('rmp-professors-raw', () => ({}))
   const index = useState<Record<string, RawProfessor>>('rmp-professors-index', () => ({}))
   const loaded = useState<boolean>('rmp-professors-loaded', () => false)
   const loading = useState<boolean>('rmp-professors-loading', () => false)
+  // Term whose ratings.json backs `index`; null while it holds the full professors.json index,
+  // which resolves names for any term
+  const indexTerm = useState<string | null>('rmp-professors-index-term', () => null)
 
   async function ensureLoaded(): Promise<void> {
-    if (loaded.value || loading.value) return
+    if (loading.value) return
+    if (loaded.value && (indexTerm.value === null || indexTerm.value === termId.value)) return
     loading.value = true
     try {
+      // Names were already matched at build time for terms that ship ratings.json
+      const termRatings = await loadTermRatings(termId.value)
+      if (termRatings) {
+        index.value = termRatings
+        indexTerm.value = termId.value
+        loaded.value = true
+        return
+      }
+      indexTerm.value = null
       const data = await loadProfessorsJSON()
       rawData.value = data
 
@@ -108,6 +141,10 @@ export function useRMPRatings() {
   async function getProfessor(name: string): Promise<Professor | null> {
     if (!name) return null
     await ensureLoaded()
+    if (indexTerm.value !== null) {
+      const raw = index.value[normalizeKey(name)]
+      return raw ? toProfessor(name, raw) : null
+    }
     const variants = buildSearchNameVariants(name)
     for (const variant of variants) {
       const raw = index.value[variant]
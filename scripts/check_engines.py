@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Run generate-test-data.py once per --engine against the stand-in API
+(stand_in_api.py) and check that both engines write the same artifacts.
+
+Each run gets its own scratch directory, so neither the response cache nor the
+generator state of one run is seen by the other. Artifacts are compared as
+parsed JSON. Exits 1 on any difference; --engine asyncio needs aiohttp.
+
+Example:
+    python check_engines.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from stand_in_api import start_server
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+GENERATOR = os.path.join(SCRIPTS_DIR, "generate-test-data.py")
+ENGINES = ("threads", "asyncio")
+TERM = "20261"
+
+
+def run_engine(engine, api_base, root):
+    """Generate TERM with `engine` in a scratch tree under `root`; returns its term directory."""
+    cwd = os.path.join(root, engine, "scripts")
+    os.makedirs(cwd)
+    subprocess.run(
+        [sys.executable, GENERATOR, "--engine", engine, "--api-base", api_base, "--term", TERM, "--retries", "0"],
+        cwd=cwd,
+        check=True,
+    )
+    return os.path.join(root, engine, "public", "data", TERM)
+
+
+def load_artifacts(term_dir):
+    artifacts = {}
+    for dirpath, _, filenames in os.walk(term_dir):
+        for name in filenames:
+            if name.endswith(".json"):
+                path = os.path.join(dirpath, name)
+                with open(path, "r", encoding="utf-8") as f:
+                    artifacts[os.path.relpath(path, term_dir)] = json.load(f)
+    return artifacts
+
+
+def main():
+    server, api_base = start_server()
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            outputs = {engine: load_artifacts(run_engine(engine, api_base, root)) for engine in ENGINES}
+    finally:
+        server.shutdown()
+
+    expected = outputs[ENGINES[0]]
+    if not expected.get("courses.json", {}).get("ENGR"):
+        print(f"{ENGINES[0]} wrote no ENGR courses; the run did not reach the stand-in API")
+        sys.exit(1)
+    mismatches = []
+    for engine in ENGINES[1:]:
+        actual = outputs[engine]
+        for name in sorted(set(expected) | set(actual)):
+            if expected.get(name) != actual.get(name):
+                mismatches.append(f"{name} differs between {ENGINES[0]} and {engine}")
+    for mismatch in mismatches:
+        print(mismatch)
+    if mismatches:
+        sys.exit(1)
+    print(f"{' and '.join(ENGINES)} wrote the same {len(expected)} artifacts")
+
+
+if __name__ == "__main__":
+    main()
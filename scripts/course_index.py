@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Precomputed course index for the frontend.
+
+Mirrors `buildIndex` in app/composables/api/indexer.ts so the client can load a
+single parsed artifact instead of rebuilding its lookup tables from courses.json:
+
+- `courses`: the cross-program de-duplicated UI course list (keyed on normalized
+  code + upper-cased title, sections merged by section id, GE letters unioned)
+- `details`: per-code aggregated details (summed enrollment/capacity, unioned
+  instructors, times, locations, duplicated credits and prerequisites)
+- `sections`: per `CODE#SECTION` details for section-level lookups
+
+Course title/code/description triples are stored once in `heads` and referenced
+by index from `details` and `sections`.
+
+Run standalone to rebuild the index of an existing term, e.g.:
+    python course_index.py ../public/data/20261/courses.json ../public/data/20261/course-index.json
+"""
+
+import argparse
+import json
+import math
+import re
+
+COURSE_INDEX_VERSION = 1
+
+_JS_FLOAT_PREFIX = re.compile(r"\s*([+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)")
+
+
+def _text(value):
+    """(value || '').toString().trim()"""
+    if not value:
+        return ""
+    return str(value).strip()
+
+
+def _number(value):
+    """Number(value || 0), with non-numeric strings treated as 0."""
+    if not value:
+        return 0
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(str(value).strip() or 0)
+    except ValueError:
+        return 0
+
+
+def _compact_number(value):
+    return int(value) if isinstance(value, float) and value.is_integer() else value
+
+
+def parse_units(value):
+    """Same coercion as the client: numbers pass through, strings use parseFloat semantics."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return _compact_number(value) if math.isfinite(value) else None
+    match = _JS_FLOAT_PREFIX.match(str(value))
+    if not match:
+        return None
+    parsed = float(match.group(1))
+    return _compact_number(parsed) if math.isfinite(parsed) else None
+
+
+def _unique(values):
+    """Array.from(new Set(values))"""
+    return list(dict.fromkeys(values))
+
+
+def normalize_course_code(value):
+    return _text(value).upper()
+
+
+def normalize_section_id(value):
+    return _text(value).upper()
+
+
+def map_section(raw):
+    """Python twin of mapSection in app/composables/api/mappers.ts."""
+    section_id = _text(raw.get("sectionCode"))
+    if not section_id:
+        return None
+    return {
+        "sectionId": section_id,
+        "instructors": _unique(t for t in (_text(s) for s in raw.get("instructors") or []) if t),
+        "enrolled": _number(raw.get("registered")),
+        "capacity": _number(raw.get("total")),
+        "schedule": _text(raw.get("time")),
+        "location": _text(raw.get("location")),
+        "hasDClearance": bool(raw.get("dClearance")),
+        "hasPrerequisites": bool(raw.get("prerequisites")),
+        "hasDuplicatedCredit": bool(raw.get("duplicatedCredits")),
+        "units": parse_units(raw.get("units")),
+        "type": raw.get("type"),
+    }
+
+
+def map_grouped_course(raw):
+    """Python twin of mapGroupedToUICourse."""
+    code = _text(raw.get("courseCode"))
+    title = _text(raw.get("title"))
+    if not code or not title:
+        return None
+    sections = [s for s in (map_section(sec) for sec in raw.get("sections") or []) if s]
+    return {
+        "title": title,
+        "code": code,
+        "description": _text(raw.get("description")),
+        "sections": sections,
+        "ge": raw.get("GE") or [],
+    }
+
+
+def merge_sections_by_id(existing, incoming):
+    by_id = {}
+    for section in existing or []:
+        sid = normalize_section_id(section["sectionId"])
+        if sid:
+            by_id[sid] = section
+    for section in incoming or []:
+        sid = normalize_section_id(section["sectionId"])
+        if sid and sid not in by_id:
+            by_id[sid] = section
+    return list(by_id.values())
+
+
+def _section_details(section):
+    return {
+        "instructors": _unique(section.get("instructors") or []),
+        "units": parse_units(section.get("units")),
+        "enrolled": _number(section.get("registered")),
+        "capacity": _number(section.get("total")),
+        "times": [section["time"]] if section.get("time") else [],
+        "locations": [section["location"]] if section.get("location") else [],
+        "duplicatedCredits": _unique(section.get("duplicatedCredits") or []),
+        "prerequisites": _unique(section.get("prerequisites") or []),
+        "dClearance": bool(section.get("dClearance")),
+        "type": section.get("type"),
+    }
+
+
+def _start_details(head_id, section):
+    """Running details of one code, seeded from its first (head, section) entry."""
+    details = _section_details(section)
+    details["instructors"] = [t for t in (_text(s) for s in details["instructors"]) if t]
+    details["head"] = head_id
+    # Sum every entry exactly once (the first section is not counted twice)
+    details["enrolled"] = 0
+    details["capacity"] = 0
+    return {
+        "details": details,
+        "instructors": dict.fromkeys(details["instructors"]),
+        "duplicatedCredits": dict.fromkeys(details["duplicatedCredits"]),
+        "prerequisites": dict.fromkeys(details["prerequisites"]),
+        "times": {},
+        "locations": {},
+    }
+
+
+def _fold_details(state, section):
+    """Fold one more section of the code into its running details."""
+    details = state["details"]
+    state["instructors"].update(dict.fromkeys(section.get("instructors") or []))
+    details["enrolled"] += _number(section.get("registered"))
+    details["capacity"] += _number(section.get("total"))
+    if section.get("time"):
+        state["times"][section["time"]] = None
+    if section.get("location"):
+        state["locations"][section["location"]] = None
+    state["duplicatedCredits"].update(dict.fromkeys(section.get("duplicatedCredits") or []))
+    state["prerequisites"].update(dict.fromkeys(section.get("prerequisites") or []))
+    details["dClearance"] = details["dClearance"] or bool(section.get("dClearance"))
+    if details["units"] is None and section.get("units") is not None:
+        units = parse_units(section.get("units"))
+        if units is not None:
+            details["units"] = units
+    if details["type"] is None and section.get("type") is not None:
+        details["type"] = section.get("type")
+
+
+def _finish_details(state):
+    details = state["details"]
+    for field in ("instructors", "duplicatedCredits", "prerequisites", "times", "locations"):
+        details[field] = list(state[field])
+    return details
+
+
+def build_course_index(courses_by_school, term=None):
+    """
+    Build the index artifact from {school: {program: [grouped courses]}}. Per-code
+    details are folded as sections stream by, so no raw section outlives its
+    program (the mapping may be a spooled view read one program at a time).
+    """
+    merged = {}
+    heads = []
+    head_ids = {}
+    details_by_code = {}
+    sections = {}
+
+    for by_program in (courses_by_school or {}).values():
+        for course_list in (by_program or {}).values():
+            for raw in course_list or []:
+                mapped = map_grouped_course(raw)
+                if mapped:
+                    key = f"{normalize_course_code(mapped['code'])}::{mapped['title'].upper()}"
+                    existing = merged.get(key)
+                    if existing is None:
+                        merged[key] = mapped
+                    else:
+                        merged[key] = {
+                            **existing,
+                            "sections": merge_sections_by_id(existing["sections"], mapped["sections"]),
+                            "ge": _unique([*existing["ge"], *mapped["ge"]]),
+                        }
+
+                code = normalize_course_code(raw.get("courseCode"))
+                head = (_text(raw.get("title")), _text(raw.get("courseCode")), _text(raw.get("description")))
+                head_id = head_ids.get(head)
+                for section in raw.get("sections") or []:
+                    sid = normalize_section_id(section.get("sectionCode"))
+                    if not sid or not code:
+                        continue
+                    if head_id is None:
+                        head_id = head_ids[head] = len(heads)
+                        heads.append(list(head))
+                    state = details_by_code.get(code)
+                    if state is None:
+                        state = details_by_code[code] = _start_details(head_id, section)
+                    _fold_details(state, section)
+                    section_key = f"{code}#{sid}"
+                    if section_key not in sections:
+                        sections[section_key] = {"head": head_id, **_section_details(section)}
+
+    details = {code: _finish_details(state) for code, state in details_by_code.items()}
+
+    return {
+        "version": COURSE_INDEX_VERSION,
+        "term": term,
+        "courses": list(merged.values()),
+        "heads": heads,
+        "details": details,
+        "sections": sections,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precomputed course index from a courses.json")
+    parser.add_argument("courses", help="Path to a term's courses.json")
+    parser.add_argument("output", help="Where to write the course index")
+    parser.add_argument("--term", default=None, help="Term code recorded in the index")
+    args = parser.parse_args()
+
+    with open(args.courses, "r", encoding="utf-8") as f:
+        courses_by_school = json.load(f)
+    index = build_course_index(courses_by_school, term=args.term)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+
+
+if __name__ == "__main__":
+    main()
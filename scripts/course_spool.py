@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+On-disk spool for the generator's per-program course lists.
+
+generate-test-data.py hands every program to the spool as soon as its final,
+post-GE-merge course list is known and then drops it from memory, so the
+generator only holds the programs still in flight. The spool keeps one compact
+JSON file per program (readable as partial output while a run is going) and
+exposes the whole catalog again as a read-only `{school: {program: [courses]}}`
+mapping that loads one program at a time.
+
+`iter_encoded_courses` streams that mapping as exactly the bytes json.dumps
+would produce for the equivalent dict (indent=2, or compact when minified),
+encoding a single program's list at a time.
+"""
+
+import json
+import os
+import shutil
+from collections.abc import Mapping
+from urllib.parse import quote
+
+from data_artifacts import encode_json
+
+
+class CourseSpool:
+    """Program course lists parked as `<directory>/<school>/<program>.json`, in the order they were added."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._paths = {}
+        # Leftovers of an interrupted run must not leak into this one
+        shutil.rmtree(directory, ignore_errors=True)
+
+    def put(self, school_prefix, program_prefix, courses):
+        relative_path = os.path.join(quote(school_prefix, safe=""), f"{quote(program_prefix, safe='')}.json")
+        path = os.path.join(self.directory, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(encode_json(courses, minify=True))
+        self._paths.setdefault(school_prefix, {})[program_prefix] = path
+
+    def load(self, school_prefix, program_prefix):
+        with open(self._paths[school_prefix][program_prefix], "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def schools(self):
+        return self._paths.keys()
+
+    def programs(self, school_prefix):
+        return (self._paths.get(school_prefix) or {}).keys()
+
+    def reorder(self, keys):
+        """Order programs (and so schools) as in `keys`, (school, program) pairs; unlisted ones follow in their current order."""
+        rank = {key: position for position, key in enumerate(keys)}
+        entries = sorted(
+            (
+                (school_prefix, program_prefix, path)
+                for school_prefix, by_program in self._paths.items()
+                for program_prefix, path in by_program.items()
+            ),
+            key=lambda entry: rank.get(entry[:2], len(rank)),
+        )
+        self._paths = {}
+        for school_prefix, program_prefix, path in entries:
+            self._paths.setdefault(school_prefix, {})[program_prefix] = path
+
+    def view(self):
+        return SpooledCourses(self)
+
+    def cleanup(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self._paths = {}
+
+
+class SpooledCourses(Mapping):
+    """Read-only {school: {program: [courses]}} view of a CourseSpool."""
+
+    def __init__(self, spool):
+        self._spool = spool
+
+    def __getitem__(self, school_prefix):
+        if school_prefix not in self._spool.schools():
+            raise KeyError(school_prefix)
+        return SpooledPrograms(self._spool, school_prefix)
+
+    def __iter__(self):
+        return iter(self._spool.schools())
+
+    def __len__(self):
+        return len(self._spool.schools())
+
+
+class SpooledPrograms(Mapping):
+    """One school's {program: [courses]}, each list read from disk on access."""
+
+    def __init__(self, spool, school_prefix):
+        self._spool = spool
+        self._school_prefix = school_prefix
+
+    def __getitem__(self, program_prefix):
+        if program_prefix not in self._spool.programs(self._school_prefix):
+            raise KeyError(program_prefix)
+        return self._spool.load(self._school_prefix, program_prefix)
+
+    def __iter__(self):
+        return iter(self._spool.programs(self._school_prefix))
+
+    def __len__(self):
+        return len(self._spool.programs(self._school_prefix))
+
+
+def _encode_value(value, minify, depth):
+    if minify:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    # Encoded strings never contain raw newlines, so re-indenting line by line is safe
+    return json.dumps(value, ensure_ascii=False, indent=2).replace("\n", "\n" + "  " * depth)
+
+
+def iter_encoded_courses(courses, minify=False):
+    """Yield text chunks of json.dumps(courses) for a {school: {program: [courses]}} mapping."""
+    newline = "" if minify else "\n"
+    key_separator = ":" if minify else ": "
+
+    def indent(depth):
+        return "" if minify else "  " * depth
+
+    if not courses:
+        yield "{}"
+        return
+    yield "{"
+    for school_position, school_prefix in enumerate(courses):
+        by_program = courses[school_prefix]
+        separator = "," if school_position else ""
+        yield f"{separator}{newline}{indent(1)}{json.dumps(school_prefix, ensure_ascii=False)}{key_separator}"
+        if not by_program:
+            yield "{}"
+            continue
+        yield "{"
+        for program_position, program_prefix in enumerate(by_program):
+            separator = "," if program_position else ""
+            yield (
+                f"{separator}{newline}{indent(2)}{json.dumps(program_prefix, ensure_ascii=False)}{key_separator}"
+                + _encode_value(by_program[program_prefix], minify, 2)
+            )
+        yield f"{newline}{indent(1)}}}"
+    yield f"{newline}}}"
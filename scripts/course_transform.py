@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+Course transform: upstream catalog courses to the processed, grouped course
+lists stored in courses.json.
+
+Kept apart from generate-test-data.py so that the generator's transform pool
+(worker processes) can import it without running the generator itself.
+`transform_payload` is the pool's entry point: it parses a raw program payload
+and returns the grouped course list.
+"""
+
+import functools
+import json
+import logging
+
+
+def _safe_course_code(course, preferred_prefix=None):
+    """
+    Choose a stable course code (courseHyphen) with preference for the requested program's prefix.
+
+    Preference order:
+    1) Any code whose prefix matches preferred_prefix (if provided)
+    2) scheduledCourseCode
+    3) matchedCourseCode
+    4) publishedCourseCode
+    Returns the first non-empty courseHyphen found.
+    """
+    try:
+        scheduled = course.get("scheduledCourseCode") or {}
+        matched = course.get("matchedCourseCode") or {}
+        published = course.get("publishedCourseCode") or {}
+
+        candidates = [scheduled, matched, published]
+        if preferred_prefix:
+            for c in candidates:
+                if (c or {}).get("prefix") == preferred_prefix and c.get("courseHyphen"):
+                    return c.get("courseHyphen")
+        for c in candidates:
+            if c.get("courseHyphen"):
+                return c.get("courseHyphen")
+    except Exception as error:
+        logging.debug(f"Failed to resolve course code: {error}")
+    return None
+
+
+def _memoize(function):
+    """
+    lru_cache for the pure per-section helpers, whose inputs repeat across
+    thousands of sections. List arguments are keyed (and passed on) as tuples;
+    arguments that still are not hashable bypass the cache.
+    """
+    cached = functools.lru_cache(maxsize=4096)(function)
+
+    @functools.wraps(function)
+    def wrapper(*args):
+        key = tuple(tuple(arg) if isinstance(arg, list) else arg for arg in args)
+        try:
+            hash(key)
+        except TypeError:
+            return function(*args)
+        return cached(*key)
+
+    wrapper.cache_info = cached.cache_info
+    return wrapper
+
+
+@_memoize
+def _parse_units(units_value):
+    """
+    Normalize units to a number when possible; otherwise keep the original string.
+    Accepts list/str/number, handles values like "4.0", 4, ["4"], [4], etc.
+    Leaves ranges (e.g., "2-4") or non-numeric values as strings.
+    """
+    if units_value is None:
+        return None
+    try:
+        value = units_value
+        if isinstance(value, (list, tuple)):
+            value = value[0] if value else None
+        if value is None:
+            return None
+        if isinstance(value, (int, float)):
+            # Coerce 4.0 -> 4 when exact integer
+            return int(value) if float(value).is_integer() else float(value)
+        if isinstance(value, str):
+            text = value.strip()
+            # Skip clear ranges like "2-4" or "1–4"
+            if "-" in text or "–" in text:
+                return text
+            # Remove trailing .0 for cleanliness when safe to do
+            try:
+                num = float(text)
+                return int(num) if num.is_integer() else num
+            except Exception:
+                return text
+        return value
+    except Exception:
+        return units_value
+
+
+_DAY_NAME_TO_ABBR = {
+    "Mon": "M",
+    "Tue": "Tu",
+    "Wed": "W",
+    "Thu": "Th",
+    "Fri": "F",
+    "Sat": "Sa",
+    "Sun": "Su",
+}
+
+
+@_memoize
+def _format_days(days_list, fallback_day_code):
+    """
+    Build a compact day string like "TuTh" from a list of day names.
+    If days_list is empty, attempt to use fallback_day_code with a small fix
+    for Thursday (H -> Th). Returns None if nothing can be formed.
+    """
+    try:
+        days_list = days_list or []
+        if days_list:
+            abbrs = [_DAY_NAME_TO_ABBR.get(d, d[:2]) for d in days_list if d]
+            return "".join(abbrs) if abbrs else None
+        code = (fallback_day_code or "").strip().upper()
+        if not code:
+            return None
+        # Replace the standalone "H" with "Th" for Thursday
+        # e.g., TH -> TTh, H -> Th
+        code = code.replace("H", "Th")
+        return code
+    except Exception:
+        return None
+
+
+def _format_time(schedule_entries):
+    """
+    Produce a human-friendly time string from schedule entries.
+    If multiple distinct meeting times exist, return the first, plus a "+N" indicator.
+    """
+    try:
+        schedule_entries = schedule_entries or []
+        if not schedule_entries:
+            return "TBA"
+        formatted = []
+        for entry in schedule_entries:
+            days = entry.get("days") or []
+            day_code = entry.get("dayCode")
+            start = entry.get("startTime") or ""
+            end = entry.get("endTime") or ""
+            day_str = _format_days(days, day_code) or ""
+            if not (day_str or start or end):
+                continue
+            if start and end:
+                formatted.append(f"{day_str} {start} - {end}".strip())
+            elif start:
+                formatted.append(f"{day_str} {start}".strip())
+            else:
+                formatted.append(day_str)
+        if not formatted:
+            return "TBA"
+        # If there are multiple distinct meeting patterns, show the first and count remainder
+        unique = []
+        seen = set()
+        for f in formatted:
+            if f not in seen:
+                unique.append(f)
+                seen.add(f)
+        if len(unique) == 1:
+            return unique[0]
+        return f"{unique[0]} (+{len(unique) - 1} more)"
+    except Exception:
+        return "TBA"
+
+
+# Day bits follow the frontend's dayIndex (0=Sun .. 6=Sat)
+_DAY_NAME_TO_BIT = {
+    "Sun": 0,
+    "Mon": 1,
+    "Tue": 2,
+    "Wed": 3,
+    "Thu": 4,
+    "Fri": 5,
+    "Sat": 6,
+}
+
+_DAY_CODE_TO_BIT = {
+    "U": 0,
+    "M": 1,
+    "T": 2,
+    "W": 3,
+    "H": 4,
+    "F": 5,
+    "S": 6,
+}
+
+
+@_memoize
+def _day_mask(days_list, fallback_day_code):
+    """
+    Build a weekday bitmask (bit 0 = Sunday) from day names, falling back to a
+    day code such as "MW" or "TH" (H is Thursday). Returns 0 if nothing is known.
+    """
+    mask = 0
+    for day in days_list or []:
+        bit = _DAY_NAME_TO_BIT.get((day or "")[:3].title())
+        if bit is not None:
+            mask |= 1 << bit
+    if mask or days_list:
+        return mask
+    for char in (fallback_day_code or "").strip().upper():
+        bit = _DAY_CODE_TO_BIT.get(char)
+        if bit is not None:
+            mask |= 1 << bit
+    return mask
+
+
+@_memoize
+def _parse_minutes(time_value):
+    """
+    Convert "10:00", "9:30 am" or "1:15PM" to minutes after midnight.
+    Returns None when the value is missing or not a clock time.
+    """
+    text = (time_value or "").strip().lower().replace(" ", "")
+    if not text:
+        return None
+    meridiem = None
+    if text.endswith(("am", "pm")):
+        meridiem = text[-2:]
+        text = text[:-2]
+    hours_text, _, minutes_text = text.partition(":")
+    try:
+        hours = int(hours_text)
+        minutes = int(minutes_text or 0)
+    except ValueError:
+        return None
+    if meridiem == "pm" and hours < 12:
+        hours += 12
+    elif meridiem == "am" and hours == 12:
+        hours = 0
+    if not (0 <= hours <= 24 and 0 <= minutes < 60):
+        return None
+    return hours * 60 + minutes
+
+
+def _structured_meetings(schedule_entries):
+    """
+    Machine-readable counterpart of _format_time covering every meeting:
+    a list of [dayMask, startMinutes, endMinutes] triples (bit 0 of dayMask is
+    Sunday). Entries without days or a complete time range are left out, so a
+    TBA section yields an empty list.
+    """
+    meetings = []
+    for entry in schedule_entries or []:
+        try:
+            mask = _day_mask(entry.get("days"), entry.get("dayCode"))
+            start = _parse_minutes(entry.get("startTime"))
+            end = _parse_minutes(entry.get("endTime"))
+        except Exception:
+            continue
+        if not mask or start is None or end is None:
+            continue
+        meeting = [mask, start, end]
+        if meeting not in meetings:
+            meetings.append(meeting)
+    return meetings
+
+
+def _split_duplicate_credit(text):
+    """
+    Split duplicate credit strings on common separators.
+    """
+    if not isinstance(text, str):
+        return []
+    parts = []
+    for chunk in text.replace("/", ",").replace(";", ",").split(","):
+        for sub in chunk.split(" and "):
+            value = sub.strip()
+            if value:
+                parts.append(value)
+    return parts
+
+def _prerequisite_codes(course):
+    prerequisites_list = []
+    for prerequisite in course.get("prerequisiteCourseCodes") or []:
+        try:
+            options = prerequisite.get("courseOptions") or []
+            if not options:
+                continue
+            code = (options[0] or {}).get("courseHyphen")
+            if code:
+                prerequisites_list.append(code)
+        except Exception:
+            continue
+    return prerequisites_list
+
+
+def _course_fields(course, preferred_prefix=None):
+    """
+    Course-level fields every section record shares: (courseCode, fallback
+    title, description, duplicated credits, prerequisites). The lists are
+    shared by all of the course's sections rather than rebuilt per section.
+    """
+    title_fallback = (
+        course.get("name")
+        or course.get("fullCourseName")
+        or ((course.get("publishedCourseCode") or {}).get("courseSpace"))
+    )
+    return (
+        _safe_course_code(course, preferred_prefix),
+        title_fallback,
+        course.get("description"),
+        _split_duplicate_credit(course.get("duplicateCredit") or ""),
+        _prerequisite_codes(course),
+    )
+
+
+def process_course(course, preferred_prefix=None):
+    sections_output = []
+    sections = course.get("sections") or []
+    try:
+        course_code, title_fallback, description_value, duplicated_credits_list, prerequisites_list = (
+            _course_fields(course, preferred_prefix)
+        )
+    except Exception as error:
+        logging.warning(f"Skipping problematic course due to error: {error}")
+        return sections_output
+    for section in sections:
+        try:
+            if section.get("isCancelled"):
+                continue
+
+            schedule_entries = section.get("schedule") or []
+            first_schedule = schedule_entries[0] if len(schedule_entries) > 0 else {}
+
+            instructors = []
+            for instructor in section.get("instructors") or []:
+                first_name = (instructor or {}).get("firstName") or ""
+                last_name = (instructor or {}).get("lastName") or ""
+                full_name = (first_name + " " + last_name).strip()
+                if full_name:
+                    instructors.append(full_name)
+
+            sections_output.append({
+                "title": section.get("name") or title_fallback,
+                "description": description_value,
+                "courseCode": course_code,
+                "section": {
+                    "sectionCode": section.get("sisSectionId"),
+                    "instructors": instructors,
+                    "units": _parse_units(section.get("units")),
+                    "total": section.get("totalSeats"),
+                    "registered": section.get("registeredSeats"),
+                    "location": first_schedule.get("location"),
+                    "time": _format_time(schedule_entries),
+                    "meetings": _structured_meetings(schedule_entries),
+                    "duplicatedCredits": duplicated_credits_list,
+                    "prerequisites": prerequisites_list,
+                    "dClearance": section.get("hasDClearance"),
+                    "type": section.get("rnrMode"),
+                },
+            })
+        except Exception as error:
+            logging.warning(f"Skipping problematic section due to error: {error}")
+
+    return sections_output
+
+# {"[SCHOOL-CODE]": {"[PROGRAM-CODE]": [processed courses]}}
+# processed courses: [{"title", "description", "courseCode", "sections": [{"sectionCode", "instructors", "units", "total", "registered", "location", "time", "meetings", "duplicatedCredits", "prerequisites", "dClearance", "type"}]}]
+# meetings: [[dayMask, startMinutes, endMinutes], ...] with bit 0 of dayMask = Sunday
+
+class ProgramCourseIndex:
+    """
+    Grouped courses for a single program, indexed for constant-time merges.
+
+    Courses are keyed on (title, description, courseCode) and each key keeps a
+    persistent set of the section codes it already holds, so adding a section
+    or merging a grouped course never rescans the destination program.
+    `courses` is the plain list that ends up in courses.json.
+    """
+
+    def __init__(self, courses=None):
+        self.courses = []
+        self._by_key = {}
+        self._seen_section_codes = {}
+        self._ge_tags = {}
+        for grouped_item in courses or []:
+            self.merge_group(grouped_item)
+
+    def __len__(self):
+        return len(self.courses)
+
+    def _get_or_create(self, title, description, course_code):
+        key = (title, description, course_code)
+        existing = self._by_key.get(key)
+        if existing is None:
+            existing = {
+                "title": title,
+                "description": description,
+                "courseCode": course_code,
+                "sections": [],
+            }
+            self._by_key[key] = existing
+            self._seen_section_codes[key] = set()
+            self.courses.append(existing)
+        return key, existing
+
+    def _add_ge_tags(self, key, grouped, ge_tags):
+        if not ge_tags:
+            return
+        tags = self._ge_tags.get(key)
+        if tags is None:
+            tags = self._ge_tags[key] = set(grouped.get("GE") or [])
+        before = len(tags)
+        tags.update(str(t) for t in ge_tags)
+        if len(tags) != before or "GE" not in grouped:
+            grouped["GE"] = sorted(tags)
+
+    def _append_section(self, key, grouped, section_obj):
+        section_code_value = section_obj.get("sectionCode")
+        seen_codes = self._seen_section_codes[key]
+        if section_code_value and section_code_value in seen_codes:
+            return
+        if section_code_value:
+            seen_codes.add(section_code_value)
+        grouped["sections"].append(section_obj)
+
+    def add_section(self, title, description, course_code, section_obj, ge_tags=None):
+        """Add one processed section, skipping section codes the course already has."""
+        key, grouped = self._get_or_create(title, description, course_code)
+        self._append_section(key, grouped, section_obj)
+        self._add_ge_tags(key, grouped, ge_tags)
+
+    def merge_group(self, grouped_item, ge_tags=None):
+        """Merge an already grouped course (sections unique by sectionCode) and union its GE tags."""
+        key, grouped = self._get_or_create(
+            grouped_item.get("title"),
+            grouped_item.get("description"),
+            grouped_item.get("courseCode"),
+        )
+        for section_obj in grouped_item.get("sections") or []:
+            self._append_section(key, grouped, section_obj)
+        self._add_ge_tags(key, grouped, list(grouped_item.get("GE") or []) + list(ge_tags or []))
+
+
+def aggregate_grouped_from_courses(course_list, preferred_prefix=None, index=None, ge_tags=None):
+    """
+    Run process_course over raw upstream courses and aggregate the resulting
+    sections by (title, description, courseCode), de-duplicating on sectionCode.
+    Sections are added to `index` when given (e.g. a program receiving GE
+    courses), otherwise to a fresh ProgramCourseIndex, which is returned.
+    """
+    if index is None:
+        index = ProgramCourseIndex()
+    for course in course_list or []:
+        processed = process_course(course, preferred_prefix=preferred_prefix)
+        for item in processed:
+            index.add_section(
+                item.get("title"),
+                item.get("description"),
+                item.get("courseCode"),
+                item.get("section") or {},
+                ge_tags,
+            )
+    return index
+
+
+def transform_payload(body, preferred_prefix=None):
+    """
+    Parse a raw program payload and group its courses; returns (grouped course
+    list, upstream course count). Safe to run in a worker process.
+    """
+    courses = (json.loads(body) or {}).get("courses", [])
+    return aggregate_grouped_from_courses(courses, preferred_prefix=preferred_prefix).courses, len(courses or [])
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Build stage for the static data served from public/data.
+
+Writes JSON either pretty-printed (indent=2, the historical format) or minified
+with compact separators, and optionally emits `.gz` and `.br` siblings at maximum
+compression so static hosting can serve precompressed bodies directly. Brotli
+output needs the optional `brotli` package; without it only gzip is produced.
+
+Run standalone to (re)build every JSON file under a directory, e.g.:
+    python data_artifacts.py ../public/data --precompress
+"""
+
+import argparse
+import filecmp
+import gzip
+import json
+import logging
+import os
+
+try:
+    import brotli
+except ImportError:  # Optional: .br siblings are skipped without it
+    brotli = None
+
+PRECOMPRESSED_SUFFIXES = (".gz", ".br")
+# Callers that precompress warn when this is False, since only .gz will be written
+BROTLI_AVAILABLE = brotli is not None
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+def encode_json(obj, minify=False):
+    if minify:
+        text = json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+    else:
+        text = json.dumps(obj, ensure_ascii=False, indent=2)
+    return text.encode("utf-8")
+
+
+def write_if_changed(path, body):
+    """Write bytes atomically unless the file already holds exactly them; returns True when written."""
+    try:
+        with open(path, "rb") as f:
+            if f.read() == body:
+                return False
+    except FileNotFoundError:
+        pass
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(body)
+    os.replace(tmp_path, path)
+    return True
+
+
+def remove_precompressed(path):
+    for suffix in PRECOMPRESSED_SUFFIXES:
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def precompress(path, body):
+    """Write .gz (and .br when available) siblings of `path`; returns {suffix: size}."""
+    sizes = {}
+    # mtime=0 keeps the gzip bytes stable so unchanged data is not rewritten
+    gz_body = gzip.compress(body, compresslevel=9, mtime=0)
+    write_if_changed(path + ".gz", gz_body)
+    sizes[".gz"] = len(gz_body)
+    if brotli is not None:
+        br_body = brotli.compress(body, quality=11)
+        write_if_changed(path + ".br", br_body)
+        sizes[".br"] = len(br_body)
+    else:
+        try:
+            os.remove(path + ".br")
+        except FileNotFoundError:
+            pass
+    return sizes
+
+
+def _replace_if_changed(tmp_path, path):
+    """Move a finished temp file over `path` unless both hold the same bytes; returns True when replaced."""
+    if os.path.exists(path) and filecmp.cmp(tmp_path, path, shallow=False):
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, path)
+    return True
+
+
+def precompress_file(path):
+    """Streaming variant of precompress for bodies too large to hold in memory."""
+    sizes = {}
+    gz_tmp_path = f"{path}.gz.tmp"
+    with open(path, "rb") as source, open(gz_tmp_path, "wb") as raw:
+        # No embedded filename and mtime=0 keep the bytes stable, as in precompress
+        with gzip.GzipFile(filename="", mode="wb", compresslevel=9, fileobj=raw, mtime=0) as gz:
+            for chunk in iter(lambda: source.read(STREAM_CHUNK_SIZE), b""):
+                gz.write(chunk)
+    sizes[".gz"] = os.path.getsize(gz_tmp_path)
+    _replace_if_changed(gz_tmp_path, path + ".gz")
+    if brotli is not None:
+        br_tmp_path = f"{path}.br.tmp"
+        compressor = brotli.Compressor(quality=11)
+        with open(path, "rb") as source, open(br_tmp_path, "wb") as out:
+            for chunk in iter(lambda: source.read(STREAM_CHUNK_SIZE), b""):
+                out.write(compressor.process(chunk))
+            out.write(compressor.finish())
+        sizes[".br"] = os.path.getsize(br_tmp_path)
+        _replace_if_changed(br_tmp_path, path + ".br")
+    else:
+        try:
+            os.remove(path + ".br")
+        except FileNotFoundError:
+            pass
+    return sizes
+
+
+def write_json_stream(path, chunks, compress=False, report=None, pretty_size=None):
+    """
+    Like write_json_artifact for JSON produced as a sequence of text chunks: the
+    body goes straight to a temp file and is never held in memory as a whole.
+    `pretty_size` is the indent=2 size for the report when the chunks are minified.
+    Returns (size in bytes, whether `path` was rewritten).
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    size = 0
+    with open(tmp_path, "wb") as f:
+        for chunk in chunks:
+            data = chunk.encode("utf-8")
+            f.write(data)
+            size += len(data)
+    written = _replace_if_changed(tmp_path, path)
+    sizes = precompress_file(path) if compress else {}
+    if not compress:
+        remove_precompressed(path)
+    if report is not None:
+        report.append({"path": path, "pretty": pretty_size or size, "json": size, **sizes})
+    return size, written
+
+
+def write_json_artifact(path, obj, minify=False, compress=False, report=None):
+    """
+    Serialize `obj` to `path`, optionally minified and precompressed. Stale
+    precompressed siblings are removed when compression is off, since static
+    hosts would otherwise keep serving them. Appends a size row to `report`.
+    Returns (body, whether `path` was rewritten).
+    """
+    body = encode_json(obj, minify=minify)
+    written = write_if_changed(path, body)
+    sizes = precompress(path, body) if compress else {}
+    if not compress:
+        remove_precompressed(path)
+    if report is not None:
+        pretty_size = len(encode_json(obj)) if minify else len(body)
+        report.append({"path": path, "pretty": pretty_size, "json": len(body), **sizes})
+    return body, written
+
+
+def _format_bytes(value):
+    if value is None:
+        return "-"
+    if value >= 1024 * 1024:
+        return f"{value / (1024 * 1024):.2f} MB"
+    return f"{value / 1024:.1f} KB"
+
+
+def log_size_report(report):
+    """Log each artifact's size against its pretty-printed form, plus totals."""
+    if not report:
+        return
+    totals = {"pretty": 0, "json": 0, ".gz": 0, ".br": 0}
+    for row in report:
+        for key in totals:
+            totals[key] += row.get(key) or 0
+        logging.info(
+            f"{row['path']}: pretty {_format_bytes(row['pretty'])}, json {_format_bytes(row['json'])}, "
+            f"gzip {_format_bytes(row.get('.gz'))}, brotli {_format_bytes(row.get('.br'))}"
+        )
+    ratio = totals["pretty"] / max(1, totals[".br"] or totals[".gz"] or totals["json"])
+    logging.info(
+        f"Total: pretty {_format_bytes(totals['pretty'])}, json {_format_bytes(totals['json'])}, "
+        f"gzip {_format_bytes(totals['.gz'] or None)}, brotli {_format_bytes(totals['.br'] or None)} "
+        f"({ratio:.1f}x smaller than pretty-printed)"
+    )
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    parser = argparse.ArgumentParser(description="Minify and precompress JSON data artifacts")
+    parser.add_argument("root", help="File or directory of JSON artifacts (e.g. ../public/data)")
+    parser.add_argument("--pretty", action="store_true", help="Keep indent=2 instead of minifying")
+    parser.add_argument("--precompress", action="store_true", help="Emit .gz and .br siblings")
+    args = parser.parse_args()
+
+    if brotli is None and args.precompress:
+        logging.warning("brotli is not installed; only .gz siblings will be written")
+
+    paths = []
+    if os.path.isdir(args.root):
+        for directory, _, files in os.walk(args.root):
+            paths.extend(os.path.join(directory, name) for name in files if name.endswith(".json"))
+    else:
+        paths.append(args.root)
+
+    report = []
+    for path in sorted(paths):
+        with open(path, "r", encoding="utf-8") as f:
+            obj = json.load(f)
+        write_json_artifact(path, obj, minify=not args.pretty, compress=args.precompress, report=report)
+    log_size_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,363 +1,1015 @@
+"""
+Generate term-scoped programs.json, courses.json and their derived artifacts
+from classes.usc.edu.
+
+Run from this directory; output goes to ../public/data/<term>/. Importing the
+module only defines functions, and main() does the work, e.g.:
+    python generate-test-data.py --term 20261 --term 20263
+    python generate-test-data.py --term 20261 --program CSCI   # refresh one program in place
+"""
+
+import argparse
+import asyncio
+import hashlib
 import json
 import os
 import requests
+import shutil
+import threading
 import time
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+
+from course_index import build_course_index
+from course_spool import CourseSpool, iter_encoded_courses
+from course_transform import ProgramCourseIndex, aggregate_grouped_from_courses, transform_payload
+from data_artifacts import BROTLI_AVAILABLE, log_size_report, write_json_artifact, write_json_stream
+from payload_archive import PayloadArchive, PayloadReplay
+from ratings_index import build_term_ratings
+from search_index import build_search_index
+from response_cache import ResponseCache, content_hash
+from retry_policy import CircuitBreaker, RetryPolicy, TokenBucket
+from work_schedule import ProgramStats, predict_makespan
 
-# Configure basic logging for clearer diagnostics and progress visibility
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-)
-
-TERM_CODE = "20261"
+try:
+    import aiohttp
+except ImportError:  # Only required for --engine asyncio
+    aiohttp = None
 
 try:
-    response = requests.get(
-        f"https://classes.usc.edu/api/Schools/TermCode?termCode={TERM_CODE}",
-        timeout=60,
+    import ijson
+except ImportError:  # Optional: payloads are parsed whole without it
+    ijson = None
+
+DEFAULT_TERM = "20261"
+DEFAULT_API_BASE = "https://classes.usc.edu/api"
+REQUEST_TIMEOUT = 60
+MAX_WORKERS = 12
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate term-scoped programs.json and courses.json from classes.usc.edu")
+    parser.add_argument(
+        "--term",
+        action="append",
+        default=None,
+        help=f"Term code to generate; repeat for several terms (default {DEFAULT_TERM}, or the archived term with --replay)",
     )
-    response.raise_for_status()
-    data = response.json()
-except Exception as error:
-    logging.error(f"Failed to fetch schools for term {TERM_CODE}: {error}")
-    raise
-
-output = {"schools": [], "success": True}
-
-# Append General Education school and default GESM program
-output["schools"].append({
-    "name": "General Education",
-    "prefix": "GE",
-    "programs": [
-        {"name": "GE Seminar", "prefix": "GESM"}
-    ]
-})
-
-for school in data:
-    programs = []
-    for program in school["programs"]:
-        programs.append({
-            "name": program["name"],
-            "prefix": program["prefix"]
-        })
+    parser.add_argument(
+        "--school",
+        action="append",
+        default=None,
+        help="Only refresh programs of this school prefix and merge them into the existing courses.json; repeatable",
+    )
+    parser.add_argument(
+        "--program",
+        action="append",
+        default=None,
+        help="Only refresh this program prefix and merge it into the existing courses.json; repeatable",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=MAX_WORKERS,
+        help="Number of concurrent fetch workers (also the HTTP connection pool size)",
+    )
+    parser.add_argument(
+        "--max-connections-per-host",
+        type=int,
+        default=None,
+        help="Cap on pooled keep-alive connections per host (defaults to --workers)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=("threads", "asyncio"),
+        default="threads",
+        help="Program fetch engine: a thread pool of --workers, or a single asyncio loop bounded by --concurrency",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=64,
+        help="Maximum in-flight requests for --engine asyncio",
+    )
+    parser.add_argument(
+        "--api-base",
+        default=DEFAULT_API_BASE,
+        help="Base URL of the classes API (point at a local stand-in server for testing)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=".http-cache",
+        help="Directory of the on-disk HTTP response cache",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=int,
+        default=0,
+        help="Seconds a cached response is reused without revalidating upstream (0 always revalidates)",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=1024,
+        help="Size bound of the response cache; least recently used entries are evicted beyond it",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the response cache and download every payload",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Reuse the previous courses.json for programs whose upstream payload and GE courses are unchanged",
+    )
+    parser.add_argument(
+        "--state-dir",
+        default=".generator-state",
+        help="Directory holding per-term program fingerprints used by --incremental",
+    )
+    parser.add_argument(
+        "--output-layout",
+        choices=("monolithic", "school", "program"),
+        default="monolithic",
+        help="Write one courses.json, or courses/<school>.json (or courses/<school>/<program>.json) shards plus courses/manifest.json",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="Write JSON with compact separators instead of indent=2",
+    )
+    parser.add_argument(
+        "--precompress",
+        action="store_true",
+        help="Also emit .gz siblings of every JSON artifact at maximum compression, and .br ones when the brotli package is installed",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=0,
+        help="Upstream requests per second across all workers (0 starts unlimited; 429s lower the rate either way)",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="Retries per request after the first attempt. Retry n waits 5*2^(n-1) to 10*2^(n-1)s (capped at 60s), "
+        "so the default 3 retries span 35-70s",
+    )
+    parser.add_argument(
+        "--professors",
+        default=os.path.join("..", "public", "data", "professors.json"),
+        help="RateMyProfessors data (from rmp_scraper.py) joined into the term's ratings.json",
+    )
+    parser.add_argument(
+        "--no-stream-parse",
+        action="store_true",
+        help="Parse each upstream payload whole instead of course by course while it downloads "
+        "(streaming also needs ijson and is off with --incremental, --transform-workers, --archive or --replay)",
+    )
+    parser.add_argument(
+        "--transform-workers",
+        type=int,
+        default=0,
+        help="Worker processes that parse and group program payloads, leaving the fetch workers to network I/O; "
+        "they take whole bodies, so this replaces the streaming parse (default 0: transform on the fetch workers)",
+    )
+    archive_options = parser.add_mutually_exclusive_group()
+    archive_options.add_argument(
+        "--archive",
+        default=None,
+        help="Also write every raw upstream response to this gzip-compressed JSONL archive",
+    )
+    archive_options.add_argument(
+        "--replay",
+        default=None,
+        help="Rebuild the term from a --archive file instead of the network",
+    )
+    return parser
 
-    output["schools"].append({
-        "name": school["name"],
-        "prefix": school["prefix"],
-        "programs": programs
-    })
 
-# Ensure term-specific directory exists
-term_dir = os.path.join("..", "public", "data", TERM_CODE)
-os.makedirs(term_dir, exist_ok=True)
+# Run-wide settings and shared clients, set up by configure()
+args = None
+API_BASE = DEFAULT_API_BASE
+payload_replay = None
+payload_archive = None
+response_cache = None
+retry_policy = None
+transform_pool = None
+streaming_parse = False
 
-with open(os.path.join(term_dir, "programs.json"), "w", encoding="utf-8") as f:
-    json.dump(output, f, ensure_ascii=False, indent=2)
 
-logging.info("Program data generated successfully, gathering data for courses…")
+_session = None
+_session_lock = threading.Lock()
 
 
-def _safe_course_code(course, preferred_prefix=None):
+def get_session():
     """
-    Choose a stable course code (courseHyphen) with preference for the requested program's prefix.
-
-    Preference order:
-    1) Any code whose prefix matches preferred_prefix (if provided)
-    2) scheduledCourseCode
-    3) matchedCourseCode
-    4) publishedCourseCode
-    Returns the first non-empty courseHyphen found.
-    """
-    try:
-        scheduled = course.get("scheduledCourseCode") or {}
-        matched = course.get("matchedCourseCode") or {}
-        published = course.get("publishedCourseCode") or {}
+    Return the process-wide pooled HTTP session, creating it on first use.
 
-        candidates = [scheduled, matched, published]
-        if preferred_prefix:
-            for c in candidates:
-                if (c or {}).get("prefix") == preferred_prefix and c.get("courseHyphen"):
-                    return c.get("courseHyphen")
-        for c in candidates:
-            if c.get("courseHyphen"):
-                return c.get("courseHyphen")
-    except Exception as error:
-        logging.debug(f"Failed to resolve course code: {error}")
-    return None
+    A single session is shared by every worker so TCP/TLS connections are kept
+    alive and reused across programs. Every request goes to the one API host, so
+    the adapter caches a single host pool whose size follows the worker count,
+    and pool_block makes workers wait for a free connection instead of opening
+    throwaway ones once the per-host limit is reached.
+    """
+    global _session
+    if _session is not None:
+        return _session
+    with _session_lock:
+        if _session is None:
+            per_host = args.max_connections_per_host or args.workers
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                # pool_connections counts cached host pools, not connections; there is one host
+                pool_connections=1,
+                pool_maxsize=max(1, per_host),
+                pool_block=True,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+
+def http_get(url, timeout=REQUEST_TIMEOUT, headers=None):
+    """GET through the shared pooled session."""
+    return get_session().get(url, timeout=timeout, headers=headers)
+
+
+def _fetch_upstream_body(url):
+    if response_cache is None:
+        response = http_get(url)
+        response.raise_for_status()
+        body = response.content
+        return body, content_hash(body)
+    cached = response_cache.lookup(url)
+    if response_cache.is_fresh(cached):
+        return response_cache.read_body(cached), cached["contentHash"]
+    response = http_get(url, headers=response_cache.conditional_headers(cached))
+    if response.status_code == 304 and cached is not None:
+        response_cache.revalidated(cached, response.headers)
+        return response_cache.read_body(cached), cached["contentHash"]
+    response.raise_for_status()
+    body = response.content
+    stored = response_cache.store(url, body, response.headers)
+    return body, stored["contentHash"]
 
 
-def _parse_units(units_value):
+def fetch_body(url):
     """
-    Normalize units to a number when possible; otherwise keep the original string.
-    Accepts list/str/number, handles values like "4.0", 4, ["4"], [4], etc.
-    Leaves ranges (e.g., "2-4") or non-numeric values as strings.
+    GET a payload and return (raw body, content hash of the body), going
+    through the response cache when enabled: fresh entries are served locally,
+    stale ones are revalidated with a conditional request and reused on 304.
+    Bodies come from the archive with --replay and are added to it with --archive.
     """
-    if units_value is None:
-        return None
-    try:
-        value = units_value
-        if isinstance(value, list):
-            value = value[0] if value else None
-        if value is None:
-            return None
-        if isinstance(value, (int, float)):
-            # Coerce 4.0 -> 4 when exact integer
-            return int(value) if float(value).is_integer() else float(value)
-        if isinstance(value, str):
-            text = value.strip()
-            # Skip clear ranges like "2-4" or "1–4"
-            if "-" in text or "–" in text:
-                return text
-            # Remove trailing .0 for cleanliness when safe to do
-            try:
-                num = float(text)
-                return int(num) if num.is_integer() else num
-            except Exception:
-                return text
-        return value
-    except Exception:
-        return units_value
+    if payload_replay is not None:
+        return payload_replay.fetch(url)
+    body, fingerprint = _fetch_upstream_body(url)
+    if payload_archive is not None:
+        payload_archive.record(url, body, fingerprint)
+    return body, fingerprint
+
+
+def fetch_payload(url):
+    """fetch_body, parsed: returns (data, content hash of the raw body)."""
+    body, fingerprint = fetch_body(url)
+    return json.loads(body), fingerprint
 
 
-_DAY_NAME_TO_ABBR = {
-    "Mon": "M",
-    "Tue": "Tu",
-    "Wed": "W",
-    "Thu": "Th",
-    "Fri": "F",
-    "Sat": "Sa",
-    "Sun": "Su",
-}
+def get_json(url):
+    return fetch_payload(url)[0]
 
 
-def _format_days(days_list, fallback_day_code):
+def start_transform_pool(workers):
     """
-    Build a compact day string like "TuTh" from a list of day names.
-    If days_list is empty, attempt to use fallback_day_code with a small fix
-    for Thursday (H -> Th). Returns None if nothing can be formed.
+    Process pool for the CPU-bound transform (course_transform), so the fetch
+    workers only do network I/O and transform throughput scales with cores.
+    The pool uses the platform's default start method; spawned workers can
+    re-import this script since main() only runs under __main__. Workers are
+    started up front, before any fetch thread exists, so a fork-based pool
+    never forks a multi-threaded process.
     """
-    try:
-        days_list = days_list or []
-        if days_list:
-            abbrs = [_DAY_NAME_TO_ABBR.get(d, d[:2]) for d in days_list if d]
-            return "".join(abbrs) if abbrs else None
-        code = (fallback_day_code or "").strip().upper()
-        if not code:
-            return None
-        # Replace the standalone "H" with "Th" for Thursday
-        # e.g., TH -> TTh, H -> Th
-        code = code.replace("H", "Th")
-        return code
-    except Exception:
+    if workers <= 0:
         return None
+    pool = ProcessPoolExecutor(max_workers=workers)
+    pool.submit(int).result()
+    return pool
 
 
-def _format_time(schedule_entries):
+def configure(parsed_args):
     """
-    Produce a human-friendly time string from schedule entries.
-    If multiple distinct meeting times exist, return the first, plus a "+N" indicator.
+    Set up the run-wide state shared by every term from parsed CLI arguments:
+    the replay source or archive, the response cache, the retry policy and
+    the transform pool. Nothing touches the network until a term is run.
     """
-    try:
-        schedule_entries = schedule_entries or []
-        if not schedule_entries:
-            return "TBA"
-        formatted = []
-        for entry in schedule_entries:
-            days = entry.get("days") or []
-            day_code = entry.get("dayCode")
-            start = entry.get("startTime") or ""
-            end = entry.get("endTime") or ""
-            day_str = _format_days(days, day_code) or ""
-            if not (day_str or start or end):
-                continue
-            if start and end:
-                formatted.append(f"{day_str} {start} - {end}".strip())
-            elif start:
-                formatted.append(f"{day_str} {start}".strip())
-            else:
-                formatted.append(day_str)
-        if not formatted:
-            return "TBA"
-        # If there are multiple distinct meeting patterns, show the first and count remainder
-        unique = []
-        seen = set()
-        for f in formatted:
-            if f not in seen:
-                unique.append(f)
-                seen.add(f)
-        if len(unique) == 1:
-            return unique[0]
-        return f"{unique[0]} (+{len(unique) - 1} more)"
-    except Exception:
-        return "TBA"
+    global args, API_BASE, payload_replay, payload_archive, response_cache, retry_policy
+    global transform_pool, streaming_parse
+    args = parsed_args
+    API_BASE = args.api_base.rstrip("/")
+    if args.precompress and not BROTLI_AVAILABLE:
+        logging.warning("brotli is not installed; --precompress will write only .gz siblings")
+
+    if args.replay:
+        payload_replay = PayloadReplay(args.replay, API_BASE)
+        logging.info(f"Replaying {len(payload_replay)} archived responses from {payload_replay.created_at}")
+    elif args.archive:
+        payload_archive = PayloadArchive(args.archive, args.term[0], API_BASE)
+
+    if not args.no_cache and payload_replay is None:
+        response_cache = ResponseCache(
+            args.cache_dir,
+            ttl_seconds=args.cache_ttl,
+            max_bytes=args.cache_max_mb * 1024 * 1024,
+        )
+
+    # One policy for every upstream call so throttling, backoff and the circuit breaker
+    # are coordinated across all workers instead of each retrying on its own schedule
+    retry_policy = RetryPolicy(
+        # A response missing from a replayed archive will not appear on retry
+        attempts=1 if payload_replay is not None else args.retries + 1,
+        limiter=TokenBucket(args.rate_limit, burst=max(1, args.workers)),
+        breaker=CircuitBreaker(),
+    )
+
+    transform_pool = start_transform_pool(args.transform_workers)
+
+    # Course-by-course parsing needs ijson. --incremental keeps whole payloads since it
+    # must see a program's fingerprint before deciding whether to process it at all, and
+    # the transform pool takes raw bodies so parsing happens off the fetch workers too.
+    # Archiving and replaying deal in whole bodies as well.
+    streaming_parse = (
+        ijson is not None
+        and not args.no_stream_parse
+        and not args.incremental
+        and transform_pool is None
+        and payload_archive is None
+        and payload_replay is None
+    )
+
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class _HashingReader:
+    """File-like wrapper that hashes every byte read through it and optionally copies it to `sink`."""
+
+    def __init__(self, read, sink=None):
+        self._read = read
+        self._sink = sink
+        self._digest = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size=-1):
+        if size == 0:
+            # ijson probes with read(0) for bytes vs str; it must not consume the body
+            return b""
+        chunk = self._read(size)
+        if chunk:
+            self._digest.update(chunk)
+            self.size += len(chunk)
+            if self._sink is not None:
+                self._sink.write(chunk)
+        return chunk
+
+    def drain(self):
+        while self.read(STREAM_CHUNK_SIZE):
+            pass
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
 
 
-def _split_duplicate_credit(text):
+def _iter_payload_courses(stream):
+    # use_float matches json.loads; ijson would otherwise yield Decimal
+    return ijson.items(stream, "courses.item", use_float=True)
+
+
+def _parse_cached_courses(meta, on_course):
+    with response_cache.open_body(meta) as f:
+        for course in _iter_payload_courses(f):
+            on_course(course)
+    return meta["contentHash"]
+
+
+def fetch_payload_streaming(url, on_course):
     """
-    Split duplicate credit strings on common separators.
+    Streaming counterpart of fetch_payload: every element of the payload's
+    `courses` array is handed to `on_course` as soon as it is parsed, while the
+    rest of the body is still downloading. The body is hashed, and copied into the
+    response cache, on its way through instead of being held in memory. Cached
+    bodies are parsed from disk the same way. Returns the content hash.
     """
-    if not isinstance(text, str):
-        return []
-    parts = []
-    for chunk in text.replace("/", ",").replace(";", ",").split(","):
-        for sub in chunk.split(" and "):
-            value = sub.strip()
-            if value:
-                parts.append(value)
-    return parts
-
-def process_course(course, preferred_prefix=None):
-    sections_output = []
-    sections = course.get("sections") or []
-    for section in sections:
+    cached = response_cache.lookup(url) if response_cache is not None else None
+    if response_cache is not None and response_cache.is_fresh(cached):
+        return _parse_cached_courses(cached, on_course)
+    headers = response_cache.conditional_headers(cached) if response_cache is not None else None
+    with get_session().get(url, timeout=REQUEST_TIMEOUT, headers=headers, stream=True) as response:
+        if response.status_code == 304 and cached is not None:
+            response_cache.revalidated(cached, response.headers)
+            return _parse_cached_courses(cached, on_course)
+        response.raise_for_status()
+        download_path = response_cache.download_path(url) if response_cache is not None else None
+        sink = open(download_path, "wb") if download_path else None
         try:
-            if section.get("isCancelled"):
-                continue
-
-            schedule_entries = section.get("schedule") or []
-            first_schedule = schedule_entries[0] if len(schedule_entries) > 0 else {}
-
-            units_value = _parse_units(section.get("units"))
-
-            duplicate_credit_value = course.get("duplicateCredit") or ""
-            duplicated_credits_list = _split_duplicate_credit(duplicate_credit_value)
-
-            prerequisite_codes = course.get("prerequisiteCourseCodes") or []
-            prerequisites_list = []
-            for prerequisite in prerequisite_codes:
-                try:
-                    options = prerequisite.get("courseOptions") or []
-                    if not options:
-                        continue
-                    code = (options[0] or {}).get("courseHyphen")
-                    if code:
-                        prerequisites_list.append(code)
-                except Exception:
-                    continue
-
-            instructors = []
-            for instructor in section.get("instructors") or []:
-                first_name = (instructor or {}).get("firstName") or ""
-                last_name = (instructor or {}).get("lastName") or ""
-                full_name = (first_name + " " + last_name).strip()
-                if full_name:
-                    instructors.append(full_name)
-
-            course_code = _safe_course_code(course, preferred_prefix)
-
-            title_value = (
-                section.get("name")
-                or course.get("name")
-                or course.get("fullCourseName")
-                or ((course.get("publishedCourseCode") or {}).get("courseSpace"))
+            reader = _HashingReader(
+                lambda size: response.raw.read(size if size and size > 0 else None, decode_content=True),
+                sink,
             )
-            description_value = course.get("description")
-
-            time_string = _format_time(schedule_entries)
-
-            sections_output.append({
-                "title": title_value,
-                "description": description_value,
-                "courseCode": course_code,
-                "section": {
-                    "sectionCode": section.get("sisSectionId"),
-                    "instructors": instructors,
-                    "units": units_value,
-                    "total": section.get("totalSeats"),
-                    "registered": section.get("registeredSeats"),
-                    "location": first_schedule.get("location"),
-                    "time": time_string,
-                    "duplicatedCredits": duplicated_credits_list,
-                    "prerequisites": prerequisites_list,
-                    "dClearance": section.get("hasDClearance"),
-                    "type": section.get("rnrMode"),
-                },
+            for course in _iter_payload_courses(reader):
+                on_course(course)
+            # Trailing keys after `courses` still belong to the hashed and cached body
+            reader.drain()
+        except BaseException:
+            if sink is not None:
+                sink.close()
+                os.remove(download_path)
+            raise
+        if sink is None:
+            return reader.hexdigest()
+        sink.close()
+        stored = response_cache.store_file(url, download_path, reader.hexdigest(), reader.size, response.headers)
+        return stored["contentHash"]
+
+
+def get_courses_payload(url):
+    """GET a payload whose only part of interest is its `courses` array."""
+    if not streaming_parse:
+        return get_json(url)
+    courses = []
+    fetch_payload_streaming(url, courses.append)
+    return {"courses": courses}
+
+
+def fetch_programs_output():
+    """Fetch the term's schools and return the programs.json payload (with the GE school prepended)."""
+    try:
+        data = retry_policy.call(lambda: get_json(f"{API_BASE}/Schools/TermCode?termCode={term_code}"), "schools")
+    except Exception as error:
+        logging.error(f"Failed to fetch schools for term {term_code}: {error}")
+        raise
+
+    output = {"schools": [], "success": True}
+
+    # Append General Education school and default GESM program
+    output["schools"].append({
+        "name": "General Education",
+        "prefix": "GE",
+        "programs": [
+            {"name": "GE Seminar", "prefix": "GESM"}
+        ]
+    })
+
+    for school in data:
+        programs = []
+        for program in school["programs"]:
+            programs.append({
+                "name": program["name"],
+                "prefix": program["prefix"]
             })
-        except Exception as error:
-            logging.warning(f"Skipping problematic section due to error: {error}")
 
-    return sections_output
+        output["schools"].append({
+            "name": school["name"],
+            "prefix": school["prefix"],
+            "programs": programs
+        })
+    return output
+
+
+def write_artifact(path, obj):
+    return write_json_artifact(path, obj, minify=args.minify, compress=args.precompress, report=artifact_report)
+
+
+def program_courses_url(school_code, program_code):
+    return f"{API_BASE}/Courses/CoursesByTermSchoolProgram?termCode={term_code}&school={school_code}&program={program_code}"
+
+
+def _retry_program_fetch(school_code, program_code, fetch_once):
+    """Call fetch_once() under the shared retry policy; the last error is re-raised for the caller."""
+    return retry_policy.call(fetch_once, f"{school_code}/{program_code}")
+
+
+def fetch_program_payload(school_code, program_code):
+    """Fetch the raw catalog payload of one program, returning (data, fingerprint)."""
+    return _retry_program_fetch(
+        school_code,
+        program_code,
+        lambda: fetch_payload(program_courses_url(school_code, program_code)),
+    )
+
+
+def fetch_program_body(school_code, program_code):
+    """fetch_program_payload without parsing, for the transform pool: returns (body, fingerprint)."""
+    return _retry_program_fetch(
+        school_code,
+        program_code,
+        lambda: fetch_body(program_courses_url(school_code, program_code)),
+    )
+
+
+def stream_program_index(school_code, program_code):
+    """
+    Stream one program's payload straight into a ProgramCourseIndex, processing
+    each course as it arrives; returns (index, fingerprint, upstream course count).
+    A failed attempt starts over with a fresh index.
+    """
+    def fetch_once():
+        index = ProgramCourseIndex()
+        received = []
+
+        def on_course(course):
+            received.append(None)
+            aggregate_grouped_from_courses([course], preferred_prefix=program_code, index=index)
+
+        fingerprint = fetch_payload_streaming(program_courses_url(school_code, program_code), on_course)
+        return index, fingerprint, len(received)
+
+    return _retry_program_fetch(school_code, program_code, fetch_once)
 
-# {"[SCHOOL-CODE]": {"[PROGRAM-CODE]": [processed courses]}}
-# processed courses: [{"title", "description", "courseCode", "sections": [{"sectionCode", "instructors", "units", "total", "registered", "location", "time", "duplicatedCredits", "prerequisites", "dClearance", "type"}]}]
 
 def get_courses(school_code, program_code):
-    last_error = None
-    for attempt_index in range(1, 5):  # initial try + 3 retries
+    if streaming_parse:
+        return stream_program_index(school_code, program_code)[0]
+    data, _ = fetch_program_payload(school_code, program_code)
+    # Aggregate sections by (title, description, courseCode)
+    return aggregate_grouped_from_courses(data.get("courses", []), preferred_prefix=program_code)
+
+# Ingest other GE categories and tag original departments
+GE_CATEGORY_MAP = [
+    ("ACORELIT", "ARTS", "A"),
+    ("ACORELIT", "HINQ", "B"),
+    ("ACORELIT", "SANA", "C"),
+    ("ACORELIT", "LIFE", "D"),
+    ("ACORELIT", "PSC", "E"),
+    ("ACORELIT", "QREA", "F"),
+    ("AGLOPERS", "GPG", "G"),
+    ("AGLOPERS", "GPH", "H"),
+]
+
+
+def ge_courses_url(ge_type, category_prefix):
+    return f"{API_BASE}/Courses/GeCoursesByTerm?termCode={term_code}&geRequirementPrefix={ge_type}&categoryPrefix={category_prefix}"
+
+
+def fetch_ge_courses(ge_type, category_prefix):
+    return retry_policy.call(
+        lambda: get_courses_payload(ge_courses_url(ge_type, category_prefix)),
+        f"GE {ge_type}/{category_prefix}",
+    )
+
+
+# Sharded output: courses/manifest.json lists one shard per school ({program: [courses]})
+# or per program ([courses]) with its size and hash, so clients can fetch only what they need.
+SHARD_MANIFEST_VERSION = 1
+
+
+def _shard_path(school_prefix, program_prefix=None):
+    school_part = quote(school_prefix, safe="")
+    if program_prefix is None:
+        return f"{school_part}.json"
+    return f"{school_part}/{quote(program_prefix, safe='')}.json"
+
+
+def write_course_shards(courses, layout):
+    """Write per-school or per-program shards plus a manifest, removing shards from older runs."""
+    shard_entries = []
+    for school_prefix in sorted(courses):
+        if layout == "school":
+            shard_entries.append((school_prefix, None))
+        else:
+            for program_prefix in sorted(courses[school_prefix] or {}):
+                shard_entries.append((school_prefix, program_prefix))
+
+    manifest_shards = []
+    written = 0
+    for school_prefix, program_prefix in shard_entries:
+        # Payloads are looked up one shard at a time since `courses` may be a spooled view
+        by_program = courses[school_prefix] or {}
+        payload = dict(by_program) if program_prefix is None else by_program[program_prefix]
+        relative_path = _shard_path(school_prefix, program_prefix)
+        body, changed = write_artifact(os.path.join(shards_dir, relative_path), payload)
+        if changed:
+            written += 1
+        manifest_shards.append({
+            "school": school_prefix,
+            "program": program_prefix,
+            "path": relative_path,
+            "bytes": len(body),
+            "sha256": content_hash(body),
+        })
+
+    keep = {os.path.normpath(entry["path"]) for entry in manifest_shards}
+    keep.add("manifest.json")
+    for root, _, files in os.walk(shards_dir):
+        for name in files:
+            relative_path = os.path.normpath(os.path.relpath(os.path.join(root, name), shards_dir))
+            base_path = relative_path
+            for suffix in (".gz", ".br"):
+                if relative_path.endswith(suffix):
+                    base_path = relative_path[: -len(suffix)]
+            if base_path not in keep:
+                os.remove(os.path.join(root, name))
+
+    manifest = {
+        "version": SHARD_MANIFEST_VERSION,
+        "term": term_code,
+        "layout": layout,
+        "shards": manifest_shards,
+    }
+    write_artifact(os.path.join(shards_dir, "manifest.json"), manifest)
+    # A stale courses.json would otherwise be read back by a later monolithic or selective run
+    for suffix in ("", ".gz", ".br"):
         try:
-            response = requests.get(
-                f"https://classes.usc.edu/api/Courses/CoursesByTermSchoolProgram?termCode={TERM_CODE}&school={school_code}&program={program_code}",
-                timeout=60,
-            )
-            response.raise_for_status()
-            data = response.json()
-
-            # Aggregate sections by (title, description, courseCode)
-            aggregation = {}
-            for course in data.get("courses", []):
-                processed_sections = process_course(course, preferred_prefix=program_code)
-                for item in processed_sections:
-                    title_value = item.get("title")
-                    description_value = item.get("description")
-                    course_code = item.get("courseCode")
-                    key = (title_value, description_value, course_code)
-
-                    if key not in aggregation:
-                        aggregation[key] = {
-                            "title": title_value,
-                            "description": description_value,
-                            "courseCode": course_code,
-                            "sections": [],
-                            "_seenSectionCodes": set(),
-                        }
-
-                    section_obj = item.get("section") or {}
-                    section_code_value = section_obj.get("sectionCode")
-                    seen_codes = aggregation[key]["_seenSectionCodes"]
-                    if section_code_value and section_code_value in seen_codes:
-                        continue
-
-                    if section_code_value:
-                        seen_codes.add(section_code_value)
-
-                    aggregation[key]["sections"].append(section_obj)
-
-            # Convert aggregation to list and drop helper field
-            courses = []
-            for grouped in aggregation.values():
-                grouped.pop("_seenSectionCodes", None)
-                courses.append(grouped)
-
-            return courses
-        except Exception as error:
-            last_error = error
-            if attempt_index < 4:
-                wait_seconds = attempt_index * 5
-                logging.warning(
-                    f"Attempt {attempt_index} failed for {school_code}/{program_code}: {error}. Retrying in {wait_seconds}s…"
-                )
-                time.sleep(wait_seconds)
-            else:
-                break
+            os.remove(os.path.join(term_dir, "courses.json" + suffix))
+        except FileNotFoundError:
+            pass
+    logging.info(f"Wrote {written} of {len(manifest_shards)} course shards ({layout} layout)")
 
-    # If all attempts failed, re-raise the last error to be handled by caller
-    raise last_error
 
-# Now, process the courses for each school and program concurrently. After finished, write term-scoped json.
+def previous_output_layout():
+    """The layout the previous run wrote, from its fingerprint state or else from the files on disk."""
+    try:
+        layout = read_fingerprint_state().get("outputLayout")
+    except (OSError, ValueError):
+        layout = None
+    if layout is None:
+        layout = "school" if os.path.exists(os.path.join(shards_dir, "manifest.json")) else "monolithic"
+    return layout
+
 
+def iter_courses_output():
+    """
+    Yield (school, program, courses) from the previous run's output in the layout it
+    was written, whatever --output-layout is now. Only one shard, or one school of
+    courses.json (all of it without ijson), is held in memory at a time.
+    """
+    if previous_output_layout() != "monolithic":
+        manifest_path = os.path.join(shards_dir, "manifest.json")
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        for entry in manifest.get("shards") or []:
+            with open(os.path.join(shards_dir, entry["path"]), "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            if entry.get("program") is None:
+                for program_prefix, courses in (payload or {}).items():
+                    yield entry["school"], program_prefix, courses
+            else:
+                yield entry["school"], entry["program"], payload
+        return
+    with open(os.path.join(term_dir, "courses.json"), "rb") as f:
+        if ijson is not None:
+            schools = ijson.kvitems(f, "", use_float=True)
+        else:
+            schools = (json.load(f) or {}).items()
+        for school_prefix, by_program in schools:
+            for program_prefix, courses in (by_program or {}).items():
+                yield school_prefix, program_prefix, courses
+
+
+# Now, process the courses for each school and program concurrently. GE categories are
+# fetched on the same pool and their tags are merged into each program as soon as both
+# the program and every GE category have arrived. After finished, write term-scoped json.
+
+# Per-term state, reset by start_term() before each term is generated
+term_code = None
+term_dir = None
+shards_dir = None
+# Size rows for every artifact written this run, logged at the end
+artifact_report = []
+
+# Programs still being assembled; finalized ones move to course_spool (see spool_program)
 courses_by_school = {}
+# (school, program) -> ProgramCourseIndex backing the lists in courses_by_school
+program_indexes = {}
+# (school, program) -> {GE_CATEGORY_MAP position: [raw GE courses]} awaiting merge
+pending_ge_courses = {}
+ge_categories_done = set()
+programs_arrived = set()
+programs_finalized = set()
+# Programs whose fetch produced nothing this run; a selective refresh keeps their previous output
+programs_failed = set()
+# Program prefix -> school prefix, for routing GE courses to their department
+program_to_school = {}
 
-def fetch_program_courses(school_prefix, program_prefix):
+# Incremental rebuild state. A program's output is a function of its raw payload and
+# the GE courses merged into it, so both are fingerprinted; when neither changed since
+# the previous run its entry from the previous courses.json is spliced back in.
+# Bump TRANSFORM_VERSION whenever course_transform or the GE merge changes its output.
+TRANSFORM_VERSION = 2
+fingerprints_path = None
+previous_fingerprints = {}
+# The previous output, parked on disk like course_spool and read back one program at a time
+previous_spool = None
+# (school, program) -> {"payload": hash, "ge": hash} for this run
+program_fingerprints = {}
+# (school, program) -> raw payload whose processing was deferred until its GE fingerprint is known
+deferred_program_payloads = {}
+incremental_stats = {"reused": 0, "processed": 0}
+
+# Durations and payload sizes of previous runs, used to submit programs largest-first
+program_stats = None
+
+# Finalized program lists wait on disk until the output is assembled, so memory only
+# holds the programs still in flight; the spool doubles as early partial output.
+course_spool = None
+
+
+def start_term(term):
+    """Point every per-term global at `term`, dropping whatever the previous term left behind."""
+    global term_code, term_dir, shards_dir, artifact_report
+    global courses_by_school, program_indexes, pending_ge_courses, ge_categories_done
+    global programs_arrived, programs_finalized, programs_failed, program_to_school
+    global fingerprints_path, previous_fingerprints, previous_spool
+    global program_fingerprints, deferred_program_payloads, incremental_stats
+    global program_stats, course_spool
+    term_code = term
+    term_dir = os.path.join("..", "public", "data", term)
+    os.makedirs(term_dir, exist_ok=True)
+    shards_dir = os.path.join(term_dir, "courses")
+    artifact_report = []
+    courses_by_school = {}
+    program_indexes = {}
+    pending_ge_courses = {}
+    ge_categories_done = set()
+    programs_arrived = set()
+    programs_finalized = set()
+    programs_failed = set()
+    program_to_school = {}
+    fingerprints_path = os.path.join(args.state_dir, term, "fingerprints.json")
+    previous_fingerprints = {}
+    previous_spool = CourseSpool(os.path.join(args.state_dir, term, "previous"))
+    program_fingerprints = {}
+    deferred_program_payloads = {}
+    incremental_stats = {"reused": 0, "processed": 0}
+    program_stats = ProgramStats(os.path.join(args.state_dir, term, "program-stats.json"))
+    course_spool = CourseSpool(os.path.join(args.state_dir, term, "spool"))
+
+
+def selective_refresh():
+    return bool(args.school or args.program)
+
+
+def program_selected(school_prefix, program_prefix):
+    """True when the --school/--program filters, if any, cover this program."""
+    return (not args.school or school_prefix in args.school) and (
+        not args.program or program_prefix in args.program
+    )
+
+
+def keep_previous_programs():
+    """
+    Seed the spool with the existing output of the term for a selective refresh.
+    Refreshed programs overwrite their entry in place; programs outside the
+    filters, and refreshes that fail, keep their previous course list.
+    """
+    kept = 0
+    try:
+        for school_prefix, program_prefix, courses in iter_courses_output():
+            course_spool.put(school_prefix, program_prefix, courses)
+            kept += 1
+    except FileNotFoundError:
+        logging.warning(f"No existing courses output for term {term_code}; writing only the refreshed programs")
+        course_spool.cleanup()
+        return
+    logging.info(f"Merging the refresh into {kept} existing programs")
+
+
+def _program_state_key(school_prefix, program_prefix):
+    return f"{school_prefix}/{program_prefix}"
+
+
+def read_fingerprint_state():
+    with open(fingerprints_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_incremental_state():
+    global previous_fingerprints
     try:
-        return (school_prefix, program_prefix, get_courses(school_prefix, program_prefix), None)
+        state = read_fingerprint_state()
+        if state.get("transformVersion") != TRANSFORM_VERSION:
+            logging.info("Transform version changed since the previous run; running a full rebuild")
+            return
+        for school_prefix, program_prefix, courses in iter_courses_output():
+            if courses is not None:
+                previous_spool.put(school_prefix, program_prefix, courses)
+    except FileNotFoundError:
+        logging.info("No previous output to reuse; running a full rebuild")
+        previous_spool.cleanup()
+        return
     except Exception as e:
-        return (school_prefix, program_prefix, None, e)
+        logging.warning(f"Ignoring unreadable incremental state: {e}")
+        previous_spool.cleanup()
+        return
+    previous_fingerprints = state.get("programs") or {}
 
-tasks = []
-with ThreadPoolExecutor(max_workers=12) as executor:
-    for school in output.get("schools", []):
+
+def write_incremental_state():
+    os.makedirs(os.path.dirname(fingerprints_path), exist_ok=True)
+    programs = {_program_state_key(*key): value for key, value in sorted(program_fingerprints.items())}
+    if selective_refresh():
+        # Programs outside the refresh keep the fingerprints of the run that built their output
+        try:
+            previous_state = read_fingerprint_state()
+        except Exception:
+            previous_state = {}
+        if previous_state.get("transformVersion") == TRANSFORM_VERSION:
+            programs = dict(sorted({**(previous_state.get("programs") or {}), **programs}.items()))
+    state = {
+        "transformVersion": TRANSFORM_VERSION,
+        "outputLayout": args.output_layout,
+        "programs": programs,
+    }
+    with open(fingerprints_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+
+
+def has_previous_output(school_prefix, program_prefix):
+    return program_prefix in previous_spool.programs(school_prefix)
+
+
+def previous_program_output(school_prefix, program_prefix):
+    return previous_spool.load(school_prefix, program_prefix)
+
+
+def can_reuse_program(school_prefix, program_prefix, payload_fingerprint):
+    """True when the raw payload matches the previous run, so processing can wait for the GE check."""
+    if not args.incremental:
+        return False
+    previous = previous_fingerprints.get(_program_state_key(school_prefix, program_prefix)) or {}
+    return (
+        previous.get("payload") == payload_fingerprint
+        and has_previous_output(school_prefix, program_prefix)
+    )
+
+
+def ge_fingerprint(buckets):
+    """Hash the raw GE courses destined for one program, in GE_CATEGORY_MAP order."""
+    canonical = json.dumps(
+        [[position, buckets[position]] for position in sorted(buckets or {})],
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def get_program_index(school_prefix, program_prefix):
+    """Return the destination index for a program, registering it in courses_by_school."""
+    key = (school_prefix, program_prefix)
+    index = program_indexes.get(key)
+    if index is None:
+        index = program_indexes[key] = ProgramCourseIndex()
+        courses_by_school.setdefault(school_prefix, {})[program_prefix] = index.courses
+    return index
+
+
+def set_program_index(school_prefix, program_prefix, index):
+    program_indexes[(school_prefix, program_prefix)] = index
+    courses_by_school.setdefault(school_prefix, {})[program_prefix] = index.courses
+
+
+def resolve_ge_destination(course):
+    """Return the (school, program) a GE course originally belongs to, or None if unknown."""
+    prog_prefix = None
+    try:
+        scheduled = course.get("scheduledCourseCode") or {}
+        published = course.get("publishedCourseCode") or {}
+        matched = course.get("matchedCourseCode") or {}
+        prog_prefix = (
+            scheduled.get("prefix")
+            or published.get("prefix")
+            or matched.get("prefix")
+        )
+    except Exception:
+        prog_prefix = None
+    school_prefix = program_to_school.get(prog_prefix)
+    if not prog_prefix or not school_prefix:
+        return None
+    return school_prefix, prog_prefix
+
+
+def finalize_program(key):
+    """Complete a program once it and every GE category have arrived, then spool it."""
+    if key in programs_finalized:
+        return
+    programs_finalized.add(key)
+    if key in programs_failed and selective_refresh():
+        # Merging only the GE courses would overwrite the list keep_previous_programs seeded
+        pending_ge_courses.pop(key, None)
+        logging.warning(f"Keeping the previous courses of {key[0]}/{key[1]}; its refresh failed")
+        return
+    merge_program_ge_courses(key)
+    spool_program(key)
+
+
+def merge_program_ge_courses(key):
+    """
+    Merge the GE courses buffered for a program into it, in GE_CATEGORY_MAP order,
+    so the output does not depend on which fetch happened to finish first.
+    """
+    buckets = pending_ge_courses.pop(key, None)
+    school_prefix, prog_prefix = key
+
+    if key in program_fingerprints:
+        ge_hash = ge_fingerprint(buckets)
+        program_fingerprints[key]["ge"] = ge_hash
+        deferred = deferred_program_payloads.pop(key, None)
+        if deferred is not None:
+            previous = previous_fingerprints.get(_program_state_key(school_prefix, prog_prefix)) or {}
+            if previous.get("ge") == ge_hash:
+                # Neither the payload nor its GE courses changed: splice the previous output back in
+                courses_by_school.setdefault(school_prefix, {})[prog_prefix] = previous_program_output(school_prefix, prog_prefix)
+                incremental_stats["reused"] += 1
+                return
+            set_program_index(
+                school_prefix,
+                prog_prefix,
+                aggregate_grouped_from_courses(deferred.get("courses", []), preferred_prefix=prog_prefix),
+            )
+        incremental_stats["processed"] += 1
+
+    if not buckets:
+        return
+    dest = get_program_index(school_prefix, prog_prefix)
+    for position in sorted(buckets):
+        # GE tags should only include the translated GE letter (A–H)
+        ge_tags = [GE_CATEGORY_MAP[position][2]]
+        aggregate_grouped_from_courses(buckets[position], preferred_prefix=prog_prefix, index=dest, ge_tags=ge_tags)
+
+
+def spool_program(key):
+    """Hand a program's final course list to the spool and drop it from memory."""
+    school_prefix, prog_prefix = key
+    by_program = courses_by_school.get(school_prefix)
+    if not by_program or prog_prefix not in by_program:
+        return
+    course_spool.put(school_prefix, prog_prefix, by_program.pop(prog_prefix))
+    if not by_program:
+        del courses_by_school[school_prefix]
+    program_indexes.pop(key, None)
+
+
+def store_program_result(school_prefix, program_prefix, courses, error, fingerprint=None, deferred_payload=None):
+    key = (school_prefix, program_prefix)
+    if error is not None:
+        logging.error(f"Error fetching courses for {school_prefix}/{program_prefix}: {error}")
+    elif courses is not None:
+        set_program_index(school_prefix, program_prefix, courses)
+    if error is not None or (courses is None and deferred_payload is None):
+        programs_failed.add(key)
+    if fingerprint is not None:
+        program_fingerprints[key] = {"payload": fingerprint}
+    if deferred_payload is not None:
+        deferred_program_payloads[key] = deferred_payload
+    programs_arrived.add(key)
+    if len(ge_categories_done) == len(GE_CATEGORY_MAP):
+        finalize_program(key)
+
+
+def store_ge_result(category, payload, error):
+    ge_type, category_prefix, _ = category
+    position = GE_CATEGORY_MAP.index(category)
+    if error is not None:
+        logging.warning(f"Failed to ingest GE {ge_type}/{category_prefix}: {error}")
+    else:
+        # group per original department
+        for course in (payload or {}).get("courses", []):
+            destination = resolve_ge_destination(course)
+            if destination is None or not program_selected(*destination):
+                # cannot resolve destination, or it is not being refreshed
+                continue
+            pending_ge_courses.setdefault(destination, {}).setdefault(position, []).append(course)
+    ge_categories_done.add(position)
+    if len(ge_categories_done) == len(GE_CATEGORY_MAP):
+        for key in list(programs_arrived):
+            finalize_program(key)
+
+
+def handle_fetch_result(result):
+    """Dispatch a finished fetch job (program, GESM or GE category) on the collecting thread."""
+    kind = result[0]
+    if kind == "ge":
+        store_ge_result(*result[1:])
+    else:
+        store_program_result(*result[1:])
+
+
+def finish_ge_tagging():
+    """Merge GE courses whose destination program was never fetched (e.g. failed or unlisted)."""
+    for key in list(pending_ge_courses):
+        finalize_program(key)
+    # Anything still in memory is final by now as well
+    for school_prefix, by_program in list(courses_by_school.items()):
+        for prog_prefix in list(by_program):
+            spool_program((school_prefix, prog_prefix))
+
+
+def iter_program_targets(programs_output):
+    """Yield (school_prefix, program_prefix) for every program fetched via the catalog endpoint."""
+    for school in programs_output.get("schools", []):
         school_prefix = school.get("prefix")
         if not school_prefix:
             continue
@@ -368,197 +1020,457 @@ with ThreadPoolExecutor(max_workers=12) as executor:
             program_prefix = program.get("prefix")
             if not program_prefix:
                 continue
-            tasks.append(executor.submit(fetch_program_courses, school_prefix, program_prefix))
+            yield school_prefix, program_prefix
 
-    for future in as_completed(tasks):
-        school_prefix, program_prefix, courses, error = future.result()
-        if error is not None:
-            logging.error(f"Error fetching courses for {school_prefix}/{program_prefix}: {error}")
-            continue
 
-        if school_prefix not in courses_by_school:
-            courses_by_school[school_prefix] = {}
-        courses_by_school[school_prefix][program_prefix] = courses
+def _program_result(school_prefix, program_prefix, data, fingerprint):
+    """Process a fetched program payload, or defer it when --incremental may reuse the previous output."""
+    if can_reuse_program(school_prefix, program_prefix, fingerprint):
+        return ("program", school_prefix, program_prefix, None, None, fingerprint, data or {})
+    courses = aggregate_grouped_from_courses((data or {}).get("courses", []), preferred_prefix=program_prefix)
+    return ("program", school_prefix, program_prefix, courses, None, fingerprint, None)
 
 
-# Build program -> school index for GE tagging
-program_to_school = {}
-for school in output.get("schools", []):
-    s_prefix = school.get("prefix")
-    for program in school.get("programs", []):
-        p_prefix = program.get("prefix")
-        if p_prefix:
-            program_to_school[p_prefix] = s_prefix
+def transform_job(school_prefix, program_prefix, body, fingerprint, fetch_seconds):
+    """Queue a fetched program body on the transform pool; the collecting side waits on the future."""
+    future = transform_pool.submit(transform_payload, body, program_prefix)
+    return ("transform", school_prefix, program_prefix, fingerprint, fetch_seconds, future)
 
 
-def fetch_ge_courses(ge_type, category_prefix):
-    last_error = None
-    for attempt_index in range(1, 5):
-        try:
-            resp = requests.get(
-                f"https://classes.usc.edu/api/Courses/GeCoursesByTerm?termCode={TERM_CODE}&geRequirementPrefix={ge_type}&categoryPrefix={category_prefix}",
-                timeout=60,
-            )
-            resp.raise_for_status()
-            return resp.json()
-        except Exception as error:
-            last_error = error
-            if attempt_index < 4:
-                wait_seconds = attempt_index * 5
-                print(
-                    f"Attempt {attempt_index} failed for GE {ge_type}/{category_prefix}: {error}. Retrying in {wait_seconds}s..."
-                )
-                time.sleep(wait_seconds)
-            else:
-                break
-    raise last_error
-
-
-def aggregate_grouped_from_courses(course_list, preferred_prefix=None):
-    aggregation = {}
-    for course in course_list or []:
-        processed = process_course(course, preferred_prefix=preferred_prefix)
-        for item in processed:
-            key = (
-                item.get("title"),
-                item.get("description"),
-                item.get("courseCode"),
-            )
-            if key not in aggregation:
-                aggregation[key] = {
-                    "title": item.get("title"),
-                    "description": item.get("description"),
-                    "courseCode": item.get("courseCode"),
-                    "sections": [],
-                    "_seenSectionCodes": set(),
-                }
-            section_obj = item.get("section") or {}
-            section_code_value = section_obj.get("sectionCode")
-            seen_codes = aggregation[key]["_seenSectionCodes"]
-            if section_code_value and section_code_value in seen_codes:
-                continue
-            if section_code_value:
-                seen_codes.add(section_code_value)
-            aggregation[key]["sections"].append(section_obj)
-    grouped = []
-    for grouped_item in aggregation.values():
-        grouped_item.pop("_seenSectionCodes", None)
-        grouped.append(grouped_item)
-    return grouped
-
-
-def merge_group_into_target(target_list, grouped_item, ge_tags=None):
-    ge_tags = ge_tags or []
-    t_title = grouped_item.get("title")
-    t_desc = grouped_item.get("description")
-    t_code = grouped_item.get("courseCode")
-    # find existing
-    found = None
-    for idx, existing in enumerate(target_list or []):
-        if (
-            existing.get("title") == t_title
-            and existing.get("description") == t_desc
-            and existing.get("courseCode") == t_code
-        ):
-            found = idx
-            break
-    if found is None:
-        new_item = dict(grouped_item)
-        if ge_tags:
-            new_item["GE"] = list(sorted(set([str(x) for x in ge_tags])))
-        target_list.append(new_item)
-    else:
-        existing = target_list[found]
-        # merge sections unique by sectionCode
-        seen = set()
-        for s in existing.get("sections", []):
-            c = s.get("sectionCode")
-            if c:
-                seen.add(c)
-        for s in grouped_item.get("sections", []):
-            c = s.get("sectionCode")
-            if c and c in seen:
-                continue
-            if c:
-                seen.add(c)
-            existing.setdefault("sections", []).append(s)
-        if ge_tags:
-            existing_ge = set(existing.get("GE") or [])
-            for t in ge_tags:
-                existing_ge.add(str(t))
-            existing["GE"] = list(sorted(existing_ge))
-
-
-# Ingest GESM into GE/GESM
-gesm_courses = []
-try:
-    gesm_payload = fetch_ge_courses("ACORELIT", "GESM")
-    gesm_courses = aggregate_grouped_from_courses((gesm_payload or {}).get("courses", []), preferred_prefix="GESM")
+def transformed_program_result(school_prefix, program_prefix, fingerprint, fetch_seconds, future):
+    """Turn a finished transform into a program result; runs on the collecting thread."""
+    try:
+        courses, size = future.result()
+    except Exception as e:
+        return ("program", school_prefix, program_prefix, None, e)
+    # The fetch workers' time is what the largest-first schedule balances
+    program_stats.record((school_prefix, program_prefix), fetch_seconds, size)
+    return ("program", school_prefix, program_prefix, ProgramCourseIndex(courses), None, fingerprint, None)
+
+
+def fetch_program_courses(school_prefix, program_prefix):
+    started = time.perf_counter()
+    try:
+        if transform_pool is not None:
+            body, fingerprint = fetch_program_body(school_prefix, program_prefix)
+            if not can_reuse_program(school_prefix, program_prefix, fingerprint):
+                return transform_job(school_prefix, program_prefix, body, fingerprint, time.perf_counter() - started)
+            data = json.loads(body)
+            size = len((data or {}).get("courses") or [])
+            result = _program_result(school_prefix, program_prefix, data, fingerprint)
+        elif streaming_parse:
+            courses, fingerprint, size = stream_program_index(school_prefix, program_prefix)
+            result = ("program", school_prefix, program_prefix, courses, None, fingerprint, None)
+        else:
+            data, fingerprint = fetch_program_payload(school_prefix, program_prefix)
+            size = len((data or {}).get("courses") or [])
+            result = _program_result(school_prefix, program_prefix, data, fingerprint)
+    except Exception as e:
+        return ("program", school_prefix, program_prefix, None, e)
+    program_stats.record((school_prefix, program_prefix), time.perf_counter() - started, size)
+    return result
+
+
+def fetch_ge_category(ge_type, category_prefix, ge_letter):
+    category = (ge_type, category_prefix, ge_letter)
+    try:
+        return ("ge", category, fetch_ge_courses(ge_type, category_prefix), None)
+    except Exception as e:
+        return ("ge", category, None, e)
+
+
+def _gesm_from_payload(payload):
+    gesm_courses = aggregate_grouped_from_courses((payload or {}).get("courses", []), preferred_prefix="GESM")
     if gesm_courses:
-        courses_by_school.setdefault("GE", {})["GESM"] = gesm_courses
         logging.info(f"Ingested GESM courses: {len(gesm_courses)}")
-except Exception as e:
-    logging.warning(f"Failed to ingest GESM via GE endpoint: {e}")
+    return gesm_courses
+
+
+def fetch_gesm_program():
+    """Ingest GESM into GE/GESM, falling back to a normal program fetch for the school that lists GESM."""
+    try:
+        gesm_courses = _gesm_from_payload(fetch_ge_courses("ACORELIT", "GESM"))
+        if gesm_courses:
+            return ("program", "GE", "GESM", gesm_courses, None)
+    except Exception as e:
+        logging.warning(f"Failed to ingest GESM via GE endpoint: {e}")
 
-# Fallback: try normal program fetch for any school that has GESM
-if not gesm_courses:
     owner_school = program_to_school.get("GESM")
     if owner_school:
         try:
             fallback_courses = get_courses(owner_school, "GESM")
             if fallback_courses:
-                courses_by_school.setdefault("GE", {})["GESM"] = fallback_courses
                 logging.info(f"Fallback ingested GESM via normal program: {len(fallback_courses)}")
+                return ("program", "GE", "GESM", fallback_courses, None)
         except Exception as e:
             logging.warning(f"Fallback GESM via normal program failed: {e}")
+    return ("program", "GE", "GESM", None, None)
 
 
-# Ingest other GE categories and tag original departments
-GE_CATEGORY_MAP = [
-    ("ACORELIT", "ARTS", "A"),
-    ("ACORELIT", "HINQ", "B"),
-    ("ACORELIT", "SANA", "C"),
-    ("ACORELIT", "LIFE", "D"),
-    ("ACORELIT", "PSC", "E"),
-    ("ACORELIT", "QREA", "F"),
-    ("AGLOPERS", "GPG", "G"),
-    ("AGLOPERS", "GPH", "H"),
-]
+def fetch_all_threaded(targets, on_result):
+    """
+    Fan GE categories, GESM and every program out over one thread pool, reporting
+    each result as it completes. GE jobs go first since every program waits on them.
+    A program handed to the transform pool comes back as a "transform" job; the
+    fetch worker moves on and its future is waited on here alongside the fetches.
+    """
+    tasks = []
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for ge_type, category_prefix, ge_letter in GE_CATEGORY_MAP:
+            tasks.append(executor.submit(fetch_ge_category, ge_type, category_prefix, ge_letter))
+        if program_selected("GE", "GESM"):
+            tasks.append(executor.submit(fetch_gesm_program))
+        for school_prefix, program_prefix in targets:
+            tasks.append(executor.submit(fetch_program_courses, school_prefix, program_prefix))
+        pending = set(tasks)
+        transforms = {}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = transforms.pop(future, None)
+                result = transformed_program_result(*job) if job else future.result()
+                if result[0] == "transform":
+                    transforms[result[-1]] = result[1:]
+                    pending.add(result[-1])
+                else:
+                    on_result(result)
+
+
+async def _async_fetch_upstream_body(http, url):
+    if response_cache is None:
+        async with http.get(url) as resp:
+            resp.raise_for_status()
+            body = await resp.read()
+            return body, content_hash(body)
+    cached = response_cache.lookup(url)
+    if response_cache.is_fresh(cached):
+        return response_cache.read_body(cached), cached["contentHash"]
+    async with http.get(url, headers=response_cache.conditional_headers(cached)) as resp:
+        if resp.status == 304 and cached is not None:
+            response_cache.revalidated(cached, resp.headers)
+            return response_cache.read_body(cached), cached["contentHash"]
+        resp.raise_for_status()
+        body = await resp.read()
+        stored = response_cache.store(url, body, resp.headers)
+        return body, stored["contentHash"]
+
+
+async def _async_fetch_body(http, url):
+    """asyncio counterpart of fetch_body, sharing the same response cache and archive."""
+    body, fingerprint = await _async_fetch_upstream_body(http, url)
+    if payload_archive is not None:
+        payload_archive.record(url, body, fingerprint)
+    return body, fingerprint
+
+
+async def _async_fetch_payload(http, url):
+    body, fingerprint = await _async_fetch_body(http, url)
+    # Parsing is CPU-bound; a worker thread keeps the event loop free to service other requests
+    return await asyncio.get_running_loop().run_in_executor(None, json.loads, body), fingerprint
+
+
+async def _async_get_payload(http, semaphore, url, label, timing=None, raw=False):
+    """
+    GET a JSON payload under the shared retry policy, like the threaded path.
+    The semaphore bounds in-flight requests; it is only held during an attempt,
+    so a request that is backing off never holds a slot it is not using.
+    Seconds spent holding a slot are appended to `timing` when given. With
+    `raw` the body is returned unparsed.
+    """
+    fetch = _async_fetch_body if raw else _async_fetch_payload
 
-for ge_type, category_prefix, ge_letter in GE_CATEGORY_MAP:
-    try:
-        payload = fetch_ge_courses(ge_type, category_prefix)
-        courses = (payload or {}).get("courses", [])
-        # group per original department
-        for course in courses:
-            # determine original program and school
-            prog_prefix = None
+    async def attempt():
+        async with semaphore:
+            started = time.perf_counter()
             try:
-                scheduled = course.get("scheduledCourseCode") or {}
-                published = course.get("publishedCourseCode") or {}
-                matched = course.get("matchedCourseCode") or {}
-                prog_prefix = (
-                    scheduled.get("prefix")
-                    or published.get("prefix")
-                    or matched.get("prefix")
-                )
-            except Exception:
-                prog_prefix = None
-            school_prefix = program_to_school.get(prog_prefix)
-            if not prog_prefix or not school_prefix:
-                # cannot resolve destination
-                continue
-            grouped_list = aggregate_grouped_from_courses([course], preferred_prefix=prog_prefix)
-            # GE tags should only include the translated GE letter (A–H)
-            ge_tags = [ge_letter]
-            dest = courses_by_school.setdefault(school_prefix, {}).setdefault(prog_prefix, [])
-            for g in grouped_list:
-                merge_group_into_target(dest, g, ge_tags)
+                return await fetch(http, url)
+            finally:
+                if timing is not None:
+                    timing.append(time.perf_counter() - started)
+
+    return await retry_policy.call_async(attempt, label)
+
+
+async def fetch_program_payload_async(http, semaphore, school_prefix, program_prefix, timing=None, raw=False):
+    return await _async_get_payload(
+        http,
+        semaphore,
+        program_courses_url(school_prefix, program_prefix),
+        f"{school_prefix}/{program_prefix}",
+        timing=timing,
+        raw=raw,
+    )
+
+
+async def get_courses_async(http, semaphore, school_prefix, program_prefix):
+    data, _ = await fetch_program_payload_async(http, semaphore, school_prefix, program_prefix)
+    return await asyncio.get_running_loop().run_in_executor(
+        None,
+        lambda: aggregate_grouped_from_courses((data or {}).get("courses", []), preferred_prefix=program_prefix),
+    )
+
+
+async def fetch_program_courses_async(http, semaphore, school_prefix, program_prefix):
+    # Time spent waiting for a free slot is not part of the program's own duration
+    timing = []
+    try:
+        if transform_pool is not None:
+            body, fingerprint = await fetch_program_payload_async(
+                http, semaphore, school_prefix, program_prefix, timing=timing, raw=True
+            )
+            if not can_reuse_program(school_prefix, program_prefix, fingerprint):
+                job = transform_job(school_prefix, program_prefix, body, fingerprint, sum(timing))
+                # Waits without blocking the loop; errors surface in transformed_program_result
+                await asyncio.wait({asyncio.wrap_future(job[-1])})
+                return transformed_program_result(*job[1:])
+            data = await asyncio.get_running_loop().run_in_executor(None, json.loads, body)
+        else:
+            data, fingerprint = await fetch_program_payload_async(
+                http, semaphore, school_prefix, program_prefix, timing=timing
+            )
+        started = time.perf_counter()
+        # Grouping runs on a worker thread, as on the threaded engine, not on the event loop
+        result = await asyncio.get_running_loop().run_in_executor(
+            None, _program_result, school_prefix, program_prefix, data, fingerprint
+        )
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
-        logging.warning(f"Failed to ingest GE {ge_type}/{category_prefix}: {e}")
+        return ("program", school_prefix, program_prefix, None, e)
+    seconds = sum(timing) + time.perf_counter() - started
+    program_stats.record((school_prefix, program_prefix), seconds, len((data or {}).get("courses") or []))
+    return result
+
+
+async def fetch_ge_category_async(http, semaphore, ge_type, category_prefix, ge_letter):
+    category = (ge_type, category_prefix, ge_letter)
+    try:
+        payload, _ = await _async_get_payload(
+            http,
+            semaphore,
+            ge_courses_url(ge_type, category_prefix),
+            f"GE {ge_type}/{category_prefix}",
+        )
+        return ("ge", category, payload, None)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        return ("ge", category, None, e)
+
+
+async def fetch_gesm_program_async(http, semaphore):
+    try:
+        payload, _ = await _async_get_payload(http, semaphore, ge_courses_url("ACORELIT", "GESM"), "GE ACORELIT/GESM")
+        gesm_courses = _gesm_from_payload(payload)
+        if gesm_courses:
+            return ("program", "GE", "GESM", gesm_courses, None)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logging.warning(f"Failed to ingest GESM via GE endpoint: {e}")
+
+    owner_school = program_to_school.get("GESM")
+    if owner_school:
+        try:
+            fallback_courses = await get_courses_async(http, semaphore, owner_school, "GESM")
+            if fallback_courses:
+                logging.info(f"Fallback ingested GESM via normal program: {len(fallback_courses)}")
+                return ("program", "GE", "GESM", fallback_courses, None)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.warning(f"Fallback GESM via normal program failed: {e}")
+    return ("program", "GE", "GESM", None, None)
+
+
+async def fetch_all_async(targets, on_result, concurrency):
+    """
+    asyncio counterpart of fetch_all_threaded.
+
+    Up to `concurrency` requests are in flight at once on a single thread, each
+    bounded by REQUEST_TIMEOUT. If the run is interrupted, every outstanding
+    request is cancelled before the HTTP session closes.
+    """
+    if aiohttp is None:
+        raise RuntimeError("--engine asyncio requires the aiohttp package (pip install aiohttp)")
+    semaphore = asyncio.Semaphore(concurrency)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    connector = aiohttp.TCPConnector(
+        limit=concurrency,
+        limit_per_host=args.max_connections_per_host or concurrency,
+    )
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as http:
+        jobs = [
+            fetch_ge_category_async(http, semaphore, ge_type, category_prefix, ge_letter)
+            for ge_type, category_prefix, ge_letter in GE_CATEGORY_MAP
+        ]
+        if program_selected("GE", "GESM"):
+            jobs.append(fetch_gesm_program_async(http, semaphore))
+        jobs.extend(
+            fetch_program_courses_async(http, semaphore, school_prefix, program_prefix)
+            for school_prefix, program_prefix in targets
+        )
+        tasks = [asyncio.create_task(job) for job in jobs]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                on_result(await next_done)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def run_term(term):
+    """
+    Generate one term's programs.json, courses.json and derived artifacts. With
+    --school/--program only the matching programs are fetched, and they are
+    merged into the term's existing courses output.
+    """
+    start_term(term)
+    output = fetch_programs_output()
+    write_artifact(os.path.join(term_dir, "programs.json"), output)
+
+    logging.info("Program data generated successfully, gathering data for courses…")
 
+    # Build program -> school index for GE tagging
+    for school in output.get("schools", []):
+        s_prefix = school.get("prefix")
+        for program in school.get("programs", []):
+            p_prefix = program.get("prefix")
+            if p_prefix:
+                program_to_school[p_prefix] = s_prefix
+
+    if selective_refresh():
+        keep_previous_programs()
+    if args.incremental:
+        load_incremental_state()
+
+    # Largest-first (LPT) submission: both engines start jobs in submission order
+    listed_targets = [target for target in iter_program_targets(output) if program_selected(*target)]
+    if selective_refresh() and not listed_targets and not program_selected("GE", "GESM"):
+        logging.warning(
+            f"--school/--program match no program listed for term {term_code}; nothing will be refreshed"
+        )
+    program_targets = program_stats.order(listed_targets)
+    slots = args.concurrency if args.engine == "asyncio" else args.workers
+    predicted_makespan = predict_makespan(program_stats.estimates(program_targets), slots)
+    known_programs = sum(1 for target in program_targets if program_stats.known(target))
+    logging.info(
+        f"Scheduling {len(program_targets)} programs largest-first ({known_programs} with timing history): "
+        f"predicted makespan {predicted_makespan:.1f}s vs "
+        f"{predict_makespan(program_stats.estimates(listed_targets), slots):.1f}s in listing order"
+    )
+    fetch_started = time.perf_counter()
+    # Replayed responses need no event loop; the threads only read them from memory
+    if args.engine == "asyncio" and payload_replay is None:
+        asyncio.run(fetch_all_async(program_targets, handle_fetch_result, args.concurrency))
+    else:
+        fetch_all_threaded(program_targets, handle_fetch_result)
+    logging.info(
+        f"Fetched all programs in {time.perf_counter() - fetch_started:.1f}s (predicted {predicted_makespan:.1f}s)"
+    )
+    if payload_replay is None:
+        # Replay timings say nothing about upstream, so they do not feed the schedule
+        program_stats.save()
+    finish_ge_tagging()
+    if args.incremental:
+        logging.info(
+            f"Incremental rebuild: reused {incremental_stats['reused']} programs, re-processed {incremental_stats['processed']}"
+        )
+
+    # Programs were spooled as they finished; listing order keeps the output independent of fetch timing
+    course_spool.reorder(
+        (school.get("prefix"), program.get("prefix"))
+        for school in output.get("schools", [])
+        for program in school.get("programs", [])
+    )
+    # Every stage below reads the spooled programs back one at a time
+    courses_output = course_spool.view()
+    if args.output_layout == "monolithic":
+        pretty_size = None
+        if args.minify:
+            pretty_size = sum(len(chunk.encode("utf-8")) for chunk in iter_encoded_courses(courses_output))
+        write_json_stream(
+            os.path.join(term_dir, "courses.json"),
+            iter_encoded_courses(courses_output, minify=args.minify),
+            compress=args.precompress,
+            report=artifact_report,
+            pretty_size=pretty_size,
+        )
+        # A stale manifest would otherwise take precedence over courses.json in the frontend
+        shutil.rmtree(shards_dir, ignore_errors=True)
+    else:
+        write_course_shards(courses_output, args.output_layout)
+
+    # Ready-to-use lookup tables so the frontend does not rebuild them on every page load.
+    # They read the spool program by program too, but each artifact is a whole-catalog
+    # table, so its own size (not the raw sections behind it) is what stays in memory.
+    course_index = build_course_index(courses_output, term=term_code)
+    write_artifact(os.path.join(term_dir, "course-index.json"), course_index)
+    write_artifact(
+        os.path.join(term_dir, "search-index.json"),
+        build_search_index(course_index["courses"], courses_output, term=term_code),
+    )
+    del course_index
 
-with open(os.path.join(term_dir, "courses.json"), "w", encoding="utf-8") as f:
-    json.dump(courses_by_school, f, ensure_ascii=False, indent=2)
+    # Only the professors teaching this term, keyed the way the client looks them up
+    try:
+        with open(args.professors, "r", encoding="utf-8") as f:
+            professors = json.load(f)
+    except FileNotFoundError:
+        logging.warning(f"No professor ratings at {args.professors}; skipping ratings.json")
+        # The client prefers a term's ratings.json over professors.json, so an old one must not linger
+        for suffix in ("", ".gz", ".br"):
+            try:
+                os.remove(os.path.join(term_dir, "ratings.json" + suffix))
+            except FileNotFoundError:
+                pass
+    else:
+        term_ratings = build_term_ratings(professors, courses_output, term=term_code)
+        write_artifact(os.path.join(term_dir, "ratings.json"), term_ratings)
+        logging.info(f"Matched ratings for {len(term_ratings['ratings'])} instructors")
+        del professors
+
+    write_incremental_state()
+    course_spool.cleanup()
+    previous_spool.cleanup()
+    log_size_report(artifact_report)
+
+    logging.info(f"Course data for term {term_code} generated successfully.")
 
-logging.info("Course data generated successfully.")
\ No newline at end of file
+
+def main(argv=None):
+    # Configure basic logging for clearer diagnostics and progress visibility
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+    )
+    parser = build_parser()
+    parsed_args = parser.parse_args(argv)
+    if (parsed_args.archive or parsed_args.replay) and len(parsed_args.term or ()) > 1:
+        parser.error("--archive and --replay take a single --term")
+    if not parsed_args.replay:
+        parsed_args.term = parsed_args.term or [DEFAULT_TERM]
+
+    configure(parsed_args)
+    if payload_replay is not None:
+        args.term = args.term or [payload_replay.term]
+        if args.term != [payload_replay.term]:
+            parser.error(f"{args.replay} archives term {payload_replay.term}, not {args.term[0]}")
+
+    try:
+        for term in dict.fromkeys(args.term):
+            run_term(term)
+    finally:
+        if transform_pool is not None:
+            transform_pool.shutdown()
+        if response_cache is not None:
+            response_cache.flush()
+    if payload_archive is not None:
+        payload_archive.close()
+        logging.info(f"Archived {payload_archive.count} upstream responses to {args.archive}")
+
+
+if __name__ == "__main__":
+    main()
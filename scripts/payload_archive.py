@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Raw upstream payload archive for offline generator runs.
+
+With --archive, generate-test-data.py writes every upstream response it uses
+to a gzip-compressed JSONL file. The first line is a header ({"version",
+"term", "apiBase", "createdAt"}). Every further line is one request (the
+schools list, a program, or a GE category) with its endpoint, its query
+parameters, when it was fetched, the body's content hash and size, and the raw
+body text.
+
+--replay serves those bodies instead of the network. A transform or GE tagging
+change can then be re-run on exactly the same input in seconds, and benchmark
+runs are reproducible.
+"""
+
+import gzip
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl
+
+ARCHIVE_VERSION = 1
+
+
+class ArchiveMiss(LookupError):
+    """The replayed archive holds no response for a request."""
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _request_path(url, api_base):
+    """The URL relative to the API base, so archives replay against any --api-base."""
+    return url[len(api_base):] if url.startswith(api_base) else url
+
+
+class PayloadArchive:
+    """Appends responses to `<path>.tmp` from any thread; close() moves the finished archive into place."""
+
+    def __init__(self, path, term, api_base):
+        self.path = path
+        self.api_base = api_base
+        self.count = 0
+        self._tmp_path = f"{path}.tmp"
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = gzip.open(self._tmp_path, "wt", encoding="utf-8", compresslevel=6)
+        self._write({"version": ARCHIVE_VERSION, "term": term, "apiBase": api_base, "createdAt": _now()})
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def record(self, url, body, content_hash):
+        request = _request_path(url, self.api_base)
+        endpoint, _, query = request.partition("?")
+        record = {
+            "request": request,
+            "endpoint": endpoint.lstrip("/"),
+            "params": dict(parse_qsl(query)),
+            "fetchedAt": _now(),
+            "contentHash": content_hash,
+            "size": len(body),
+            # surrogateescape round-trips bodies that are not valid UTF-8
+            "body": body.decode("utf-8", "surrogateescape"),
+        }
+        with self._lock:
+            self._write(record)
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+            os.replace(self._tmp_path, self.path)
+
+
+class PayloadReplay:
+    """Serves the bodies of an archive by request; later records of the same request win."""
+
+    def __init__(self, path, api_base):
+        self.api_base = api_base
+        self._bodies = {}
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("version") != ARCHIVE_VERSION:
+                raise ValueError(f"{path} is not a version {ARCHIVE_VERSION} payload archive")
+            self.term = header.get("term")
+            self.created_at = header.get("createdAt")
+            for line in f:
+                record = json.loads(line)
+                body = record["body"].encode("utf-8", "surrogateescape")
+                self._bodies[record["request"]] = (body, record["contentHash"])
+
+    def __len__(self):
+        return len(self._bodies)
+
+    def fetch(self, url):
+        """Return (body, content hash) as archived, like the generator's fetch_body."""
+        request = _request_path(url, self.api_base)
+        try:
+            return self._bodies[request]
+        except KeyError:
+            raise ArchiveMiss(f"{request} is not in the archive") from None
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Term-scoped professor ratings.
+
+Joins the RateMyProfessors data in public/data/professors.json (written by
+rmp_scraper.py) against the instructors a term's courses actually list, and
+keeps only the professors that matched. Names are resolved exactly as
+`useRMPRatings` in app/composables/useRMPRatings.ts does at runtime: whitespace
+is collapsed, case is folded, and both the as-listed and the reversed
+("Last First") order are tried. The result is keyed by each instructor's
+normalized name, so the client only needs a direct lookup.
+
+Run standalone against an existing term, e.g.:
+    python ratings_index.py ../public/data/professors.json ../public/data/20261/courses.json \
+        ../public/data/20261/ratings.json --term 20261
+"""
+
+import argparse
+import json
+import re
+
+RATINGS_VERSION = 1
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_whitespace(text):
+    return _WHITESPACE.sub(" ", text.strip())
+
+
+def normalize_key(text):
+    return normalize_whitespace(text).lower()
+
+
+def build_name_index(professors):
+    """The client's lookup index: every professors.json key plus its reversed tokenization."""
+    index = {}
+    for key, value in (professors or {}).items():
+        index[normalize_key(key)] = value
+        parts = normalize_whitespace(key).split(" ")
+        if len(parts) > 1:
+            index[normalize_key(f"{' '.join(parts[1:])} {parts[0]}")] = value
+    return index
+
+
+def search_name_variants(name):
+    """buildSearchNameVariants: the name as listed, then with its last token moved to the front."""
+    normalized = normalize_whitespace(name)
+    parts = normalized.split(" ")
+    if len(parts) == 1:
+        return [normalize_key(normalized)]
+    return [normalize_key(normalized), normalize_key(f"{parts[-1]} {' '.join(parts[:-1])}")]
+
+
+def iter_instructors(courses_by_school):
+    for by_program in (courses_by_school or {}).values():
+        for course_list in (by_program or {}).values():
+            for course in course_list or []:
+                for section in course.get("sections") or []:
+                    for instructor in section.get("instructors") or []:
+                        if isinstance(instructor, str) and instructor.strip():
+                            yield instructor
+
+
+def build_term_ratings(professors, courses_by_school, term=None):
+    """Build {version, term, ratings: {normalized instructor name: professors.json record}}."""
+    index = build_name_index(professors)
+    ratings = {}
+    unmatched = set()
+    for instructor in iter_instructors(courses_by_school):
+        key = normalize_key(instructor)
+        if key in ratings or key in unmatched:
+            continue
+        for variant in search_name_variants(instructor):
+            record = index.get(variant)
+            if record is not None:
+                ratings[key] = record
+                break
+        else:
+            unmatched.add(key)
+    return {
+        "version": RATINGS_VERSION,
+        "term": term,
+        "ratings": dict(sorted(ratings.items())),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Join RateMyProfessors data against a term's instructors")
+    parser.add_argument("professors", help="Path to professors.json")
+    parser.add_argument("courses", help="Path to a term's courses.json")
+    parser.add_argument("output", help="Where to write the term's ratings")
+    parser.add_argument("--term", default=None, help="Term code recorded in the output")
+    args = parser.parse_args()
+
+    with open(args.professors, "r", encoding="utf-8") as f:
+        professors = json.load(f)
+    with open(args.courses, "r", encoding="utf-8") as f:
+        courses_by_school = json.load(f)
+    ratings = build_term_ratings(professors, courses_by_school, term=args.term)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(ratings, f, ensure_ascii=False, separators=(",", ":"))
+
+
+if __name__ == "__main__":
+    main()
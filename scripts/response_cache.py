@@ -0,0 +1,214 @@
+"""
+Persistent on-disk HTTP response cache shared by the data generation scripts.
+
+Each cached URL is stored as two files named after the SHA-256 of the URL:
+`<key>.body` holds the raw response bytes and `<key>.json` holds metadata
+(validators, content hash, timestamps, size). Entries are revalidated with
+If-None-Match / If-Modified-Since when the upstream sent ETag / Last-Modified;
+otherwise the SHA-256 of the body is used to detect an unchanged payload so it
+is not rewritten. The cache is bounded in bytes and evicts least recently used
+entries first; plain hits only touch `lastUsed` in memory, and flush() writes
+those back so the eviction order carries over to the next run. All methods are
+safe to call from multiple threads.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+
+def _url_key(url):
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def content_hash(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, directory, ttl_seconds=0, max_bytes=1024 * 1024 * 1024):
+        self.directory = directory
+        self.ttl_seconds = max(0, ttl_seconds or 0)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> metadata dict (kept in memory so eviction never rescans the directory)
+        self._entries = {}
+        # Keys whose lastUsed changed since their metadata was last written
+        self._touched = set()
+        self._total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _meta_path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _body_path(self, key):
+        return os.path.join(self.directory, f"{key}.body")
+
+    def _load(self):
+        for name in os.listdir(self.directory):
+            if name.endswith((".tmp", ".download")):
+                # Left behind by an interrupted write or streamed download
+                os.remove(os.path.join(self.directory, name))
+                continue
+            if not name.endswith(".json"):
+                continue
+            key = name[:-5]
+            try:
+                with open(self._meta_path(key), "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                if not os.path.exists(self._body_path(key)):
+                    raise FileNotFoundError(self._body_path(key))
+            except Exception as error:
+                logging.debug(f"Dropping unreadable cache entry {key}: {error}")
+                self._remove_files(key)
+                continue
+            self._entries[key] = meta
+            self._total_bytes += int(meta.get("size") or 0)
+
+    def _remove_files(self, key):
+        for path in (self._meta_path(key), self._body_path(key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _write_atomic(path, data):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _write_meta(self, key, meta):
+        self._write_atomic(self._meta_path(key), json.dumps(meta).encode("utf-8"))
+
+    def lookup(self, url):
+        """Return the metadata for a cached URL, or None."""
+        key = _url_key(url)
+        with self._lock:
+            meta = self._entries.get(key)
+            if meta is None:
+                return None
+            meta["lastUsed"] = time.time()
+            self._touched.add(key)
+            return dict(meta)
+
+    def is_fresh(self, meta):
+        """True when the entry is young enough to be served without contacting upstream."""
+        if not meta or not self.ttl_seconds:
+            return False
+        return time.time() - float(meta.get("fetchedAt") or 0) < self.ttl_seconds
+
+    @staticmethod
+    def conditional_headers(meta):
+        """Request headers that let upstream answer 304 Not Modified."""
+        headers = {}
+        if not meta:
+            return headers
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("lastModified"):
+            headers["If-Modified-Since"] = meta["lastModified"]
+        return headers
+
+    def read_body(self, meta):
+        with open(self._body_path(_url_key(meta["url"])), "rb") as f:
+            return f.read()
+
+    def open_body(self, meta):
+        """Open the cached body for incremental reading."""
+        return open(self._body_path(_url_key(meta["url"])), "rb")
+
+    def download_path(self, url):
+        """Scratch file a streamed response can be copied into before store_file."""
+        return f"{self._body_path(_url_key(url))}.{threading.get_ident()}.download"
+
+    def revalidated(self, meta, headers=None):
+        """
+        Record that upstream confirmed the cached body is still current. Validators
+        sent with the 304 replace the stored ones.
+        """
+        headers = headers or {}
+        key = _url_key(meta["url"])
+        with self._lock:
+            current = self._entries.get(key)
+            if current is None:
+                return
+            if headers.get("ETag"):
+                current["etag"] = headers["ETag"]
+            if headers.get("Last-Modified"):
+                current["lastModified"] = headers["Last-Modified"]
+            current["fetchedAt"] = time.time()
+            current["lastUsed"] = current["fetchedAt"]
+            self._write_meta(key, current)
+            self._touched.discard(key)
+
+    def store(self, url, body, headers=None):
+        """
+        Cache a fresh 200 response and return its metadata. When the body hash
+        matches what is already cached only the metadata is refreshed.
+        """
+        return self._commit(url, content_hash(body), len(body), headers, lambda path: self._write_atomic(path, body))
+
+    def store_file(self, url, source_path, digest, size, headers=None):
+        """
+        Like store, for a body that was streamed to `source_path` (see download_path)
+        while its hash and size were computed. The file is moved into the cache or,
+        when the body is unchanged, removed.
+        """
+        try:
+            return self._commit(url, digest, size, headers, lambda path: os.replace(source_path, path))
+        finally:
+            try:
+                os.remove(source_path)
+            except FileNotFoundError:
+                pass
+
+    def _commit(self, url, digest, size, headers, write_body):
+        headers = headers or {}
+        key = _url_key(url)
+        now = time.time()
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "lastModified": headers.get("Last-Modified"),
+            "contentHash": digest,
+            "size": size,
+            "fetchedAt": now,
+            "lastUsed": now,
+        }
+        with self._lock:
+            previous = self._entries.get(key)
+            unchanged = previous is not None and previous.get("contentHash") == digest
+            if not unchanged:
+                write_body(self._body_path(key))
+            self._write_meta(key, meta)
+            self._touched.discard(key)
+            self._total_bytes += meta["size"] - (int(previous.get("size") or 0) if previous else 0)
+            self._entries[key] = meta
+            self._evict(keep=key)
+        return dict(meta)
+
+    def _evict(self, keep=None):
+        if self.max_bytes is None or self._total_bytes <= self.max_bytes:
+            return
+        for key, meta in sorted(self._entries.items(), key=lambda kv: kv[1].get("lastUsed") or 0):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self._remove_files(key)
+            self._total_bytes -= int(meta.get("size") or 0)
+            del self._entries[key]
+            self._touched.discard(key)
+
+    def flush(self):
+        """Write back the lastUsed times of entries that were only read since they were stored."""
+        with self._lock:
+            for key in self._touched:
+                self._write_meta(key, self._entries[key])
+            self._touched.clear()
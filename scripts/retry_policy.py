@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Shared retry, rate limiting and circuit breaking for upstream HTTP calls.
+
+One RetryPolicy is shared by every worker (threads or asyncio tasks) of a run:
+
+- TokenBucket spaces requests out across all workers. A 429 halves its rate
+  (starting from the observed request rate when no limit was configured) and
+  each success raises it again by a few percent, so throughput settles just
+  below what upstream accepts. A Retry-After header pauses the whole bucket,
+  not just the worker that received it.
+- CircuitBreaker watches the outcome of recent requests; when the error rate
+  spikes it holds every worker back for a cool-down, then lets a single probe
+  through before the pool resumes.
+- Failed attempts back off exponentially with equal jitter (half the step
+  fixed, half random), so workers do not retry in lockstep yet every retry
+  still waits. With the defaults the three retries of a request span 35-70s,
+  no less than the flat 5/10/15s schedule they replaced, so a short upstream
+  outage is ridden out. Client errors other than 408/429 are not retried.
+"""
+
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+def error_status(error):
+    """HTTP status carried by a requests or aiohttp error, or None for transport errors."""
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is None:
+        status = getattr(error, "status", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after_seconds(error):
+    """Seconds requested by a Retry-After header on the error's response, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or getattr(error, "headers", None)
+    value = (headers or {}).get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def is_retryable(error):
+    status = error_status(error)
+    return status is None or status in RETRYABLE_STATUSES
+
+
+class TokenBucket:
+    """Thread-safe, adaptive request rate shared by all workers; `rate=None` starts unlimited."""
+
+    MIN_RATE = 0.2
+    RECOVERY = 1.05
+
+    def __init__(self, rate=None, burst=1, max_rate=None):
+        self.rate = rate or None
+        self.max_rate = max_rate or self.rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Take a token and return how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._recent.append(now)
+            while self._recent and now - self._recent[0] > 5:
+                self._recent.popleft()
+            delay = max(0.0, self._paused_until - now)
+            if self.rate is None:
+                return delay
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens < 0:
+                delay = max(delay, -self._tokens / self.rate)
+            return delay
+
+    def acquire(self):
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds):
+        """Hold every caller back for `seconds` (e.g. upstream sent Retry-After)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def throttled(self):
+        """Upstream answered 429: halve the rate."""
+        with self._lock:
+            current = self.rate or max(self.MIN_RATE, len(self._recent) / 5)
+            self.rate = max(self.MIN_RATE, current / 2)
+            self._tokens = min(self._tokens, 0.0)
+            self._updated = time.monotonic()
+            rate = self.rate
+        logging.warning(f"Upstream is throttling; lowering the request rate to {rate:.1f}/s")
+
+    def succeeded(self):
+        with self._lock:
+            if self.rate is None:
+                return
+            self.rate *= self.RECOVERY
+            if self.max_rate is not None:
+                self.rate = min(self.rate, self.max_rate)
+
+
+class CircuitBreaker:
+    """
+    Opens when at least `threshold` of the last `window` requests failed (after
+    `min_calls` outcomes), holding everyone back for `cooldown` seconds. Once the
+    cool-down is over one probe request is let through: success closes the
+    breaker, failure re-opens it with twice the cool-down (up to `max_cooldown`).
+    """
+
+    PROBE_WAIT = 1.0
+
+    def __init__(self, window=20, threshold=0.5, min_calls=10, cooldown=15.0, max_cooldown=120.0):
+        self.window = window
+        self.threshold = threshold
+        self.min_calls = min_calls
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._cooldown = cooldown
+        self._outcomes = deque(maxlen=window)
+        self._open_until = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def delay(self):
+        """Seconds the caller must wait before sending a request (0 when it may go now)."""
+        with self._lock:
+            if self._open_until is None:
+                return 0.0
+            remaining = self._open_until - time.monotonic()
+            if remaining > 0:
+                return remaining
+            if self._probing:
+                return self.PROBE_WAIT
+            self._probing = True
+            return 0.0
+
+    def record(self, success):
+        with self._lock:
+            if self._open_until is not None:
+                if not self._probing:
+                    # Requests already in flight when the breaker opened
+                    return
+                self._probing = False
+                if success:
+                    self._open_until = None
+                    self._cooldown = self.base_cooldown
+                    self._outcomes.clear()
+                else:
+                    self._cooldown = min(self.max_cooldown, self._cooldown * 2)
+                    self._open_until = time.monotonic() + self._cooldown
+                return
+            self._outcomes.append(bool(success))
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) < self.min_calls or failures < self.threshold * len(self._outcomes):
+                return
+            self._open_until = time.monotonic() + self._cooldown
+            error_rate = failures / len(self._outcomes)
+            cooldown = self._cooldown
+        logging.warning(
+            f"Upstream error rate {error_rate:.0%} over the last {self.window} requests; "
+            f"pausing all requests for {cooldown:.0f}s"
+        )
+
+
+class RetryPolicy:
+    """Runs single attempts with shared rate limiting, circuit breaking and jittered exponential backoff."""
+
+    def __init__(self, attempts=4, base_delay=10.0, max_delay=60.0, limiter=None, breaker=None):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = limiter or TokenBucket()
+        self.breaker = breaker or CircuitBreaker()
+
+    def backoff(self, attempt_index, error):
+        """Delay before retry number `attempt_index`: Retry-After when given, else equal jitter."""
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        step = min(self.max_delay, self.base_delay * 2 ** (attempt_index - 1))
+        return step / 2 + random.uniform(0, step / 2)
+
+    def _failed(self, attempt_index, error, label):
+        """Record a failed attempt; returns the backoff delay, or None when the error should propagate."""
+        retryable = is_retryable(error)
+        # A definitive client error still means upstream is answering
+        self.breaker.record(not retryable)
+        if error_status(error) == 429:
+            self.limiter.throttled()
+        if not retryable or attempt_index >= self.attempts:
+            return None
+        delay = self.backoff(attempt_index, error)
+        if retry_after_seconds(error) is not None:
+            self.limiter.pause(delay)
+        logging.warning(f"Attempt {attempt_index} failed for {label}: {error!r}. Retrying in {delay:.1f}s…")
+        return delay
+
+    def _succeeded(self):
+        self.breaker.record(True)
+        self.limiter.succeeded()
+
+    def call(self, attempt, label):
+        """Call attempt() until it succeeds or retries are exhausted, re-raising the last error."""
+        for attempt_index in range(1, self.attempts + 1):
+            while True:
+                wait = self.breaker.delay()
+                if not wait:
+                    break
+                time.sleep(wait)
+            self.limiter.acquire()
+            try:
+                result = attempt()
+            except Exception as error:
+                delay = self._failed(attempt_index, error, label)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self._succeeded()
+            return result
+
+    async def call_async(self, attempt, label):
+        """asyncio counterpart of call; `attempt` is a coroutine function."""
+        for attempt_index in range(1, self.attempts + 1):
+            while True:
+                wait = self.breaker.delay()
+                if not wait:
+                    break
+                await asyncio.sleep(wait)
+            await self.limiter.acquire_async()
+            try:
+                result = await attempt()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                delay = self._failed(attempt_index, error, label)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self._succeeded()
+            return result
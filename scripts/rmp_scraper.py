@@ -4,19 +4,54 @@ RateMyProfessors Scraper
 Scrapes all professor ratings from USC (School ID: U2Nob29sLTEzODE=) and exports to JSON.
 Handles duplicate professor names by averaging their scores.
 Includes legacyId as 'id' field for non-duplicated professors.
+
+Entries are folded into per-name running sums as pages arrive, so a crawl's
+memory grows with unique names rather than raw entries.
+
+With --incremental the previous rmp_professors.json is patched instead of
+rebuilt: a snapshot of every professor's record keyed by legacyId, written by
+the previous --incremental run, tells which professors were added, changed or
+removed, and only their names are re-averaged.
+
+With --sharded the crawl is split by the department filter values the search
+returns, and the shards' cursor chains run concurrently under a shared
+concurrency and rate cap (see retry_policy.py). Completed departments are
+checkpointed the way the serial crawl checkpoints pages.
+
+Pass --output ../public/data/professors.json --precompress to install the
+result as the site's professor data along with its .gz/.br siblings. The site
+reads each term's ratings.json in preference to professors.json, so re-run
+generate-test-data.py (or ratings_index.py) for every term afterwards.
 """
 
+import argparse
+import os
 import requests
 import json
+import sys
+import threading
 import time
-from typing import Dict, List, Any
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional, Tuple, Callable
+from requests.adapters import HTTPAdapter
+
+from data_artifacts import BROTLI_AVAILABLE, write_json_artifact
+from retry_policy import CircuitBreaker, RetryPolicy, TokenBucket
 
 # Constants
 GRAPHQL_URL = "https://www.ratemyprofessors.com/graphql"
 SCHOOL_ID = "U2Nob29sLTEzODE="  # USC
 BATCH_SIZE = 1000  # Maximum allowed per request
 OUTPUT_FILE = "rmp_professors.json"
+SNAPSHOT_FILE = "rmp_snapshot.json"
+SNAPSHOT_VERSION = 1
+CHECKPOINT_FILE = "rmp_checkpoint.json"
+CHECKPOINT_VERSION = 4
+CHECKPOINT_MAX_AGE_HOURS = 24  # older checkpoints are discarded; ratings drift between crawls
+PAGE_ATTEMPTS = 6  # initial try + 5 retries per page
+DEFAULT_SHARD_WORKERS = 8
+DEFAULT_RATE_LIMIT = 5.0  # requests per second across all shards
 
 # GraphQL Query
 GRAPHQL_QUERY = """query TeacherSearchResultsPageQuery(
@@ -127,8 +162,8 @@ fragment TeacherSearchPagination_search_2MvZSr on newSearch {
 """
 
 
-def make_request(cursor: str = "") -> Dict[str, Any]:
-    """Make a GraphQL request to RateMyProfessors API."""
+def make_request(cursor: str = "", department_id: Optional[str] = None, session=None) -> Dict[str, Any]:
+    """Make a GraphQL request to RateMyProfessors API, optionally restricted to one department."""
     
     # Update the query to use the cursor for pagination
     query = GRAPHQL_QUERY.replace('first: 1000, after: ""', f'first: {BATCH_SIZE}, after: "{cursor}"')
@@ -155,31 +190,101 @@ def make_request(cursor: str = "") -> Dict[str, Any]:
             "includeSchoolFilter": True
         }
     }
+    if department_id:
+        payload["variables"]["query"]["departmentID"] = department_id
     
-    response = requests.post(GRAPHQL_URL, headers=headers, json=payload)
+    response = (session or requests).post(GRAPHQL_URL, headers=headers, json=payload)
     response.raise_for_status()
     return response.json()
 
 
-def scrape_all_professors() -> Dict[str, List[Dict[str, Any]]]:
-    """Scrape all professors from RateMyProfessors, collecting all entries including duplicates."""
+class ScrapeFailed(Exception):
+    """A page or department shard kept failing; no output is written for the incomplete crawl."""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def load_checkpoint(path: str, mode: str) -> Optional[Dict[str, Any]]:
+    """The saved crawl progress, if it belongs to this school, batch size and crawl mode and is recent enough."""
+    checkpoint = load_json_file(path)
+    if not checkpoint:
+        return None
+    if (
+        checkpoint.get("version") != CHECKPOINT_VERSION
+        or checkpoint.get("school_id") != SCHOOL_ID
+        or checkpoint.get("batch_size") != BATCH_SIZE
+        or checkpoint.get("mode") != mode
+    ):
+        print(f"Ignoring checkpoint {path} from a different crawl configuration")
+        return None
+    try:
+        age = datetime.now(timezone.utc) - datetime.fromisoformat(checkpoint["createdAt"])
+    except (KeyError, TypeError, ValueError):
+        print(f"Ignoring checkpoint {path} without a valid createdAt")
+        return None
+    age_hours = age.total_seconds() / 3600
+    if age_hours > CHECKPOINT_MAX_AGE_HOURS:
+        print(
+            f"Ignoring checkpoint {path} started {age_hours:.0f}h ago "
+            f"(older than {CHECKPOINT_MAX_AGE_HOURS}h); starting over"
+        )
+        return None
+    return checkpoint
+
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    """Write the checkpoint atomically so a crash mid-write never loses the previous one."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def scrape_all_professors(
+    checkpoint_path: Optional[str] = CHECKPOINT_FILE,
+    collector: Optional["ProfessorCollector"] = None,
+) -> "ProfessorCollector":
+    """
+    Scrape all professors from RateMyProfessors, folding every entry (including
+    duplicates) into `collector` as each page arrives.
+
+    The cursor and everything collected so far are checkpointed after each page,
+    and a later run resumes from there unless the checkpoint is older than
+    CHECKPOINT_MAX_AGE_HOURS. A failing page is retried with capped
+    exponential backoff; once retries are exhausted ScrapeFailed is raised and
+    the checkpoint is left in place. It is removed after a complete crawl.
+    """
+    policy = RetryPolicy(attempts=PAGE_ATTEMPTS, base_delay=2.0, max_delay=60.0)
     
-    # Use defaultdict to collect all professors with the same name
-    professors = defaultdict(list)
+    if collector is None:
+        collector = ProfessorCollector()
     cursor = ""
     page = 1
     total_count = None
-    total_processed = 0
+    created_at = _now()
+    
+    checkpoint = load_checkpoint(checkpoint_path, "serial") if checkpoint_path else None
+    if checkpoint and not collector.restore(checkpoint.get("professors") or {}):
+        print(f"Checkpoint {checkpoint_path} has no snapshot records for --incremental; starting over")
+        checkpoint = None
+    if checkpoint:
+        cursor = checkpoint.get("cursor") or ""
+        page = checkpoint.get("page") or 1
+        total_count = checkpoint.get("total_count")
+        created_at = checkpoint["createdAt"]
+        print(f"Resuming from page {page} with {collector.total} professors already collected")
     
     while True:
         print(f"Fetching page {page} (cursor: {cursor[:20] if cursor else 'initial'})...")
         
         try:
-            data = make_request(cursor)
+            data = policy.call(lambda: make_request(cursor), f"page {page}")
         except Exception as e:
-            print(f"Error on page {page}: {e}")
-            time.sleep(5)
-            continue
+            raise ScrapeFailed(f"Page {page} failed after {PAGE_ATTEMPTS} attempts: {e}") from e
         
         # Extract teacher data
         teachers_data = data.get("data", {}).get("search", {}).get("teachers", {})
@@ -190,25 +295,11 @@ def scrape_all_professors() -> Dict[str, List[Dict[str, Any]]]:
             total_count = teachers_data.get("resultCount", 0)
             print(f"Total professors to fetch: {total_count}")
         
-        # Process each professor
+        # Fold each professor into the running per-name aggregates
         for edge in edges:
-            node = edge.get("node", {})
-            
-            first_name = node.get("firstName", "")
-            last_name = node.get("lastName", "")
-            full_name = f"{first_name} {last_name}".strip()
-            
-            # Collect all professors with this name, including legacyId
-            professors[full_name].append({
-                "id": node.get("legacyId"),
-                "difficulty": node.get("avgDifficulty"),
-                "rating": node.get("avgRating"),
-                "rating_count": node.get("numRatings"),
-                "take_again": node.get("wouldTakeAgainPercent")
-            })
-            total_processed += 1
+            collector.add(edge.get("node", {}))
         
-        print(f"Processed {len(edges)} professors. Total so far: {total_processed}")
+        print(f"Processed {len(edges)} professors. Total so far: {collector.total}")
         
         # Check if there are more pages
         has_next_page = page_info.get("hasNextPage", False)
@@ -223,84 +314,457 @@ def scrape_all_professors() -> Dict[str, List[Dict[str, Any]]]:
             break
         
         page += 1
+        if checkpoint_path:
+            save_checkpoint(checkpoint_path, {
+                "version": CHECKPOINT_VERSION,
+                "school_id": SCHOOL_ID,
+                "batch_size": BATCH_SIZE,
+                "mode": "serial",
+                "createdAt": created_at,
+                "cursor": cursor,
+                "page": page,
+                "total_count": total_count,
+                "professors": collector.to_state(),
+            })
         
         # Be nice to the server
         time.sleep(1)
     
-    return professors
+    if checkpoint_path:
+        remove_checkpoint(checkpoint_path)
+    return collector
 
 
-def average_professors(professors: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
-    """Average the scores for professors with duplicate names and add 'duplicated' flag."""
-    
-    result = {}
-    duplicates_found = 0
-    
-    for name, entries in professors.items():
-        if len(entries) > 1:
-            duplicates_found += 1
-            print(f"Found duplicate: {name} ({len(entries)} entries)")
-            
-            # Calculate averages, handling None values
-            total_difficulty = []
-            total_rating = []
-            total_rating_count = []
-            total_take_again = []
-            
-            for entry in entries:
-                if entry["difficulty"] is not None:
-                    total_difficulty.append(entry["difficulty"])
-                if entry["rating"] is not None:
-                    total_rating.append(entry["rating"])
-                if entry["rating_count"] is not None:
-                    total_rating_count.append(entry["rating_count"])
-                if entry["take_again"] is not None:
-                    total_take_again.append(entry["take_again"])
-            
-            # For duplicates, do NOT include the id field
-            result[name] = {
-                "difficulty": round(sum(total_difficulty) / len(total_difficulty), 2) if total_difficulty else None,
-                "rating": round(sum(total_rating) / len(total_rating), 2) if total_rating else None,
-                "rating_count": int(sum(total_rating_count) / len(total_rating_count)) if total_rating_count else None,
-                "take_again": round(sum(total_take_again) / len(total_take_again), 2) if total_take_again else None,
-                "duplicated": True
-            }
-        else:
+def remove_checkpoint(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def professor_entry(node: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """Map a Teacher node to (full name, entry) as collected by the scrapers."""
+    first_name = node.get("firstName", "")
+    last_name = node.get("lastName", "")
+    full_name = f"{first_name} {last_name}".strip()
+    return full_name, {
+        "id": node.get("legacyId"),
+        "difficulty": node.get("avgDifficulty"),
+        "rating": node.get("avgRating"),
+        "rating_count": node.get("numRatings"),
+        "take_again": node.get("wouldTakeAgainPercent")
+    }
+
+
+class ProfessorStats:
+    """
+    Running aggregate of every entry seen under one name: a count and sum per
+    metric (None values are skipped), plus the entry itself while it is the
+    only one, since single professors are written out as-is with their id.
+    """
+
+    __slots__ = (
+        "entries", "first",
+        "difficulty_sum", "difficulty_n",
+        "rating_sum", "rating_n",
+        "rating_count_sum", "rating_count_n",
+        "take_again_sum", "take_again_n",
+    )
+
+    def __init__(self) -> None:
+        self.entries = 0
+        self.first = None
+        self.difficulty_sum = self.rating_sum = self.rating_count_sum = self.take_again_sum = 0
+        self.difficulty_n = self.rating_n = self.rating_count_n = self.take_again_n = 0
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        self.entries += 1
+        self.first = entry if self.entries == 1 else None
+        if entry["difficulty"] is not None:
+            self.difficulty_sum += entry["difficulty"]
+            self.difficulty_n += 1
+        if entry["rating"] is not None:
+            self.rating_sum += entry["rating"]
+            self.rating_n += 1
+        if entry["rating_count"] is not None:
+            self.rating_count_sum += entry["rating_count"]
+            self.rating_count_n += 1
+        if entry["take_again"] is not None:
+            self.take_again_sum += entry["take_again"]
+            self.take_again_n += 1
+
+    def finalize(self) -> Dict[str, Any]:
+        """The professors.json record for this name."""
+        if self.entries == 1:
             # Single entry, no duplication - include the id field
-            entry = entries[0]
-            result[name] = {
+            entry = self.first
+            return {
                 "id": entry["id"],
                 "difficulty": entry["difficulty"],
                 "rating": entry["rating"],
                 "rating_count": entry["rating_count"],
                 "take_again": entry["take_again"]
             }
+        # For duplicates, do NOT include the id field
+        return {
+            "difficulty": round(self.difficulty_sum / self.difficulty_n, 2) if self.difficulty_n else None,
+            "rating": round(self.rating_sum / self.rating_n, 2) if self.rating_n else None,
+            "rating_count": int(self.rating_count_sum / self.rating_count_n) if self.rating_count_n else None,
+            "take_again": round(self.take_again_sum / self.take_again_n, 2) if self.take_again_n else None,
+            "duplicated": True
+        }
+
+    def to_state(self) -> List[Any]:
+        return [self.entries, self.first] + [getattr(self, slot) for slot in self.__slots__[2:]]
+
+    @classmethod
+    def from_state(cls, state: List[Any]) -> "ProfessorStats":
+        stats = cls()
+        for slot, value in zip(cls.__slots__, state):
+            setattr(stats, slot, value)
+        return stats
+
+
+class ProfessorCollector:
+    """
+    Folds Teacher nodes into per-name ProfessorStats as pages arrive, so memory
+    grows with unique names rather than raw entries. With `keep_records` the
+    per-professor snapshot records needed by --incremental are kept as well.
+    """
+
+    def __init__(self, keep_records: bool = False) -> None:
+        self.stats: Dict[str, ProfessorStats] = {}
+        self.records: Optional[Dict[str, Dict[str, Any]]] = {} if keep_records else None
+        self.total = 0
+
+    def add(self, node: Dict[str, Any]) -> None:
+        name, entry = professor_entry(node)
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = ProfessorStats()
+        stats.add(entry)
+        self.total += 1
+        if self.records is not None:
+            self.records[snapshot_key(name, entry)] = {"name": name, **entry}
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "stats": {name: stats.to_state() for name, stats in self.stats.items()},
+            "records": self.records,
+        }
+
+    def restore(self, state: Dict[str, Any]) -> bool:
+        """Load a checkpointed state; False when it lacks the records this collector must keep."""
+        if self.records is not None and state.get("records") is None:
+            return False
+        self.total = state.get("total") or 0
+        self.stats = {name: ProfessorStats.from_state(values) for name, values in (state.get("stats") or {}).items()}
+        if self.records is not None:
+            self.records = state["records"]
+        return True
+
+
+def department_shards(teachers_data: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """(department name, department ID) options of the search's department filter."""
+    for search_filter in teachers_data.get("filters") or []:
+        if "department" not in (search_filter.get("field") or ""):
+            continue
+        return [
+            (option.get("value") or "", option["id"])
+            for option in search_filter.get("options") or []
+            if option.get("id")
+        ]
+    return []
+
+
+def crawl_shard(
+    policy: RetryPolicy,
+    session,
+    department_id: Optional[str],
+    label: str,
+    on_node: Callable[[Dict[str, Any]], None],
+) -> int:
+    """Follow one cursor chain to its end, handing each page's Teacher nodes to `on_node`; returns the node count."""
+    count = 0
+    cursor = ""
+    while True:
+        data = policy.call(lambda: make_request(cursor, department_id, session), label)
+        teachers_data = data.get("data", {}).get("search", {}).get("teachers", {})
+        for edge in teachers_data.get("edges", []):
+            on_node(edge.get("node", {}))
+            count += 1
+        page_info = teachers_data.get("pageInfo", {})
+        cursor = page_info.get("endCursor", "")
+        if not page_info.get("hasNextPage", False) or not cursor:
+            return count
+
+
+def scrape_sharded(
+    workers: int = DEFAULT_SHARD_WORKERS,
+    rate_limit: float = DEFAULT_RATE_LIMIT,
+    collector: Optional[ProfessorCollector] = None,
+    checkpoint_path: Optional[str] = CHECKPOINT_FILE,
+) -> ProfessorCollector:
+    """
+    Crawl every department's cursor chain concurrently and fold each page,
+    de-duplicated by legacyId, into `collector` as it arrives. At most `workers`
+    requests are in flight and all shards share one `rate_limit` (requests per
+    second).
+
+    Whenever a department finishes, the collector's state, the legacyIds folded
+    so far and the finished department IDs are checkpointed, and a later run only
+    crawls the departments still missing. Raises ScrapeFailed, keeping the
+    checkpoint, if any department's chain fails.
+    """
+    if collector is None:
+        collector = ProfessorCollector()
+    policy = RetryPolicy(
+        limiter=TokenBucket(rate_limit, burst=max(1, workers), max_rate=rate_limit),
+        breaker=CircuitBreaker(),
+    )
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=max(1, workers), pool_block=True))
+
+    first_page = policy.call(lambda: make_request(session=session), "filters")
+    teachers_data = first_page.get("data", {}).get("search", {}).get("teachers", {})
+    total_count = teachers_data.get("resultCount", 0) or 0
+    shards = department_shards(teachers_data)
+    if not shards:
+        print("Search returned no department filter; falling back to the serial crawl")
+        return scrape_all_professors(checkpoint_path=checkpoint_path, collector=collector)
+    print(f"Total professors to fetch: {total_count} across {len(shards)} departments")
+
+    # legacyIds already folded into the collector; professors listed under several
+    # departments appear in several shards
+    seen = set()
+    completed = set()
+    created_at = _now()
+    checkpoint = load_checkpoint(checkpoint_path, "sharded") if checkpoint_path else None
+    if checkpoint and not collector.restore(checkpoint.get("professors") or {}):
+        print(f"Checkpoint {checkpoint_path} has no snapshot records for --incremental; starting over")
+        checkpoint = None
+    if checkpoint:
+        # Departments still missing may already have folded some pages; `seen` skips those on the re-crawl
+        seen = set(checkpoint.get("seen") or [])
+        completed = set(checkpoint.get("departments") or [])
+        created_at = checkpoint["createdAt"]
+        print(f"Resuming with {len(completed)} of {len(shards)} departments already crawled")
+
+    lock = threading.Lock()
+
+    def add_new(node):
+        key = node.get("legacyId") or node.get("id")
+        with lock:
+            if key not in seen:
+                seen.add(key)
+                collector.add(node)
+
+    def checkpoint_state():
+        # Copied under the lock so shards still running cannot change it mid-write
+        with lock:
+            state = collector.to_state()
+            if state["records"] is not None:
+                state["records"] = dict(state["records"])
+            return {
+                "version": CHECKPOINT_VERSION,
+                "school_id": SCHOOL_ID,
+                "batch_size": BATCH_SIZE,
+                "mode": "sharded",
+                "createdAt": created_at,
+                "departments": sorted(completed),
+                "seen": list(seen),
+                "professors": state,
+            }
+
+    # The unfiltered first page is kept too; it may hold professors without a department
+    for edge in teachers_data.get("edges", []):
+        add_new(edge.get("node", {}))
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(crawl_shard, policy, session, department_id, f"department {name}", add_new): (name, department_id)
+            for name, department_id in shards
+            if department_id not in completed
+        }
+        for future in as_completed(futures):
+            name, department_id = futures[future]
+            try:
+                count = future.result()
+            except Exception as e:
+                print(f"Error crawling department {name}: {e}")
+                failed.append(name)
+                continue
+            print(f"Department {name}: {count} professors. Unique so far: {len(seen)}")
+            if checkpoint_path:
+                completed.add(department_id)
+                save_checkpoint(checkpoint_path, checkpoint_state())
+
+    if failed:
+        # A partial crawl would drop every professor of the failed departments from the output
+        raise ScrapeFailed(f"{len(failed)} departments failed: {', '.join(sorted(failed))}")
+    if len(seen) < total_count:
+        print(f"Warning: sharded crawl found {len(seen)} of {total_count} professors (some may have no department)")
+    if checkpoint_path:
+        remove_checkpoint(checkpoint_path)
+    return collector
+
+
+def average_professors(professors: Dict[str, ProfessorStats], report: bool = True) -> Dict[str, Dict[str, Any]]:
+    """
+    Finalize each name's running aggregate: duplicates are averaged and flagged
+    'duplicated'. With `report` every duplicate and their total are printed.
+    """
+    
+    result = {}
+    duplicates_found = 0
     
-    print(f"\nTotal duplicates found: {duplicates_found}")
+    for name, stats in professors.items():
+        if stats.entries > 1:
+            duplicates_found += 1
+            if report:
+                print(f"Found duplicate: {name} ({stats.entries} entries)")
+        result[name] = stats.finalize()
+    
+    if report:
+        print(f"\nTotal duplicates found: {duplicates_found}")
     return result
 
 
+def snapshot_key(name: str, entry: Dict[str, Any]) -> str:
+    return str(entry["id"]) if entry.get("id") is not None else f"name:{name}"
+
+
+def load_json_file(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Ignoring unreadable {path}: {e}")
+        return None
+
+
+def save_snapshot(path: str, snapshot: Dict[str, Dict[str, Any]], output_path: str) -> None:
+    # The snapshot only describes the output it was saved with; --incremental checks the pairing
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(
+            {"version": SNAPSHOT_VERSION, "output": os.path.abspath(output_path), "professors": snapshot},
+            f,
+            ensure_ascii=False,
+        )
+
+
+def refresh_professors(
+    current: Dict[str, Dict[str, Any]],
+    previous_snapshot: Dict[str, Dict[str, Any]],
+    previous_output: Dict[str, Dict[str, Any]],
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]], Dict[str, int]]:
+    """
+    Patch the previous output with this crawl's snapshot records (a
+    ProfessorCollector's `records`), which also become the new snapshot. A
+    professor counts as changed when any field of their record (name, rating,
+    difficulty, take-again or numRatings) differs from the snapshot, so ratings
+    that move without new reviews are picked up too. Only names touched by an
+    added, changed or removed professor are re-averaged; the duplicate report is
+    left to full rebuilds since it would only cover those names. Returns
+    (output, new snapshot, counts).
+    """
+    added = current.keys() - previous_snapshot.keys()
+    removed = previous_snapshot.keys() - current.keys()
+    changed = {key for key in current.keys() & previous_snapshot.keys() if current[key] != previous_snapshot[key]}
+
+    snapshot = current
+    affected_names = {snapshot[key]["name"] for key in added | changed}
+    affected_names |= {previous_snapshot[key].get("name") for key in removed | changed}
+
+    stats_by_name = {}
+    for record in snapshot.values():
+        if record["name"] in affected_names:
+            stats_by_name.setdefault(record["name"], ProfessorStats()).add(record)
+
+    result = dict(previous_output)
+    for name in affected_names:
+        if name not in stats_by_name:
+            result.pop(name, None)
+    result.update(average_professors(stats_by_name, report=False))
+    counts = {"added": len(added), "changed": len(changed), "removed": len(removed), "names": len(affected_names)}
+    return result, snapshot, counts
+
+
 def main():
     """Main function to run the scraper."""
+    parser = argparse.ArgumentParser(description="Scrape USC professor ratings from RateMyProfessors")
+    parser.add_argument("--sharded", action="store_true", help="Crawl departments concurrently instead of one cursor chain")
+    parser.add_argument("--workers", type=int, default=DEFAULT_SHARD_WORKERS, help="Concurrent requests for --sharded")
+    parser.add_argument("--rate-limit", type=float, default=DEFAULT_RATE_LIMIT, help="Requests per second for --sharded")
+    parser.add_argument("--output", default=OUTPUT_FILE, help=f"Where to write the professors JSON (default {OUTPUT_FILE})")
+    parser.add_argument(
+        "--precompress",
+        action="store_true",
+        help="Also write .gz siblings of the output, and .br ones when the brotli package is installed",
+    )
+    parser.add_argument("--incremental", action="store_true", help="Patch the --output file using the snapshot of the previous run")
+    parser.add_argument("--restart", action="store_true", help=f"Discard {CHECKPOINT_FILE} and crawl everything again")
+    args = parser.parse_args()
+
     print("Starting RateMyProfessors scraper...")
     print(f"School ID: {SCHOOL_ID}")
     print(f"Batch size: {BATCH_SIZE}")
-    print(f"Output file: {OUTPUT_FILE}")
+    print(f"Output file: {args.output}")
+    if args.precompress and not BROTLI_AVAILABLE:
+        print("brotli is not installed; --precompress will write only a .gz sibling")
     print("-" * 50)
     
     # Scrape all professors (including duplicates)
-    professors_raw = scrape_all_professors()
+    if args.restart and os.path.exists(CHECKPOINT_FILE):
+        os.remove(CHECKPOINT_FILE)
+    # Only --incremental needs per-professor records; otherwise memory scales with unique names
+    collector = ProfessorCollector(keep_records=args.incremental)
+    try:
+        if args.sharded:
+            scrape_sharded(args.workers, args.rate_limit, collector)
+        else:
+            scrape_all_professors(collector=collector)
+    except ScrapeFailed as e:
+        print(f"\n{e}")
+        completed_work = "departments" if args.sharded else "pages"
+        print(f"{args.output} was not written. Completed {completed_work} are kept in {CHECKPOINT_FILE}; run again to resume.")
+        sys.exit(1)
     
     # Average duplicates and add flags
     print("\nProcessing duplicates...")
-    professors = average_professors(professors_raw)
+    previous_snapshot = load_json_file(SNAPSHOT_FILE) if args.incremental else None
+    previous_output = load_json_file(args.output) if args.incremental else None
+    if (
+        previous_snapshot
+        and previous_snapshot.get("version") == SNAPSHOT_VERSION
+        # Snapshots from before --output always describe the default output file
+        and previous_snapshot.get("output", os.path.abspath(OUTPUT_FILE)) == os.path.abspath(args.output)
+        and previous_output is not None
+    ):
+        professors, snapshot, counts = refresh_professors(
+            collector.records, previous_snapshot.get("professors") or {}, previous_output
+        )
+        print(
+            f"Refresh: {counts['added']} added, {counts['changed']} changed, {counts['removed']} removed; "
+            f"re-averaged {counts['names']} names"
+        )
+    else:
+        if args.incremental:
+            print("No usable snapshot from a previous run; rebuilding everything")
+        professors = average_professors(collector.stats)
+        snapshot = collector.records
     
     # Save to JSON file
-    print(f"\nSaving {len(professors)} unique professors to {OUTPUT_FILE}...")
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(professors, f, indent=2, ensure_ascii=False)
+    print(f"\nSaving {len(professors)} unique professors to {args.output}...")
+    # Stale .gz/.br siblings are removed without --precompress, so hosts never serve an old copy
+    write_json_artifact(args.output, professors, compress=args.precompress)
     
-    print(f"Done! Saved to {OUTPUT_FILE}")
+    if snapshot is not None:
+        save_snapshot(SNAPSHOT_FILE, snapshot, args.output)
+    print(f"Done! Saved to {args.output}")
     
     # Print sample with duplicates
     print("\nSample entries (including duplicates if any):")
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Section time index and conflict-free schedule enumeration.
+
+Builds a per-term index from a generated courses.json: every section's structured
+`meetings` (see process_course in generate-test-data.py) become a weekly bitset
+with one bit per minute, and sections are grouped per course into lecture /
+discussion / lab / ... components by their `type` (rnrMode). A schedule takes one
+section from every component of every requested course. courses.json carries no
+section links, so any lecture is combined with any discussion or lab of the same
+course; schedules may pair sections that registration would reject.
+
+Sections of the same component that meet at identical times are collapsed into a
+single option, and the search prunes with bitset intersections, forward checking
+and a days-on-campus bound against the current top N (see enumerate_schedules).
+
+Example:
+    python schedule_engine.py ../public/data/20261/courses.json CSCI-103 MATH-226 WRIT-150 --top 10
+"""
+
+import argparse
+import heapq
+import json
+import re
+import sys
+import time
+from collections import defaultdict
+
+MINUTES_PER_DAY = 24 * 60
+DAY_BITS = (1 << MINUTES_PER_DAY) - 1
+# Partial schedules expanded before the search gives up and returns the best found so far
+DEFAULT_MAX_NODES = 500_000
+
+
+_LECTURE_LAB = re.compile(r"(^|[^a-z])(lec|lecture)/(lab)([^a-z]|$)")
+_LECTURE_AND_LAB = re.compile(r"(^|[^a-z])(lecture)(and|&|/)\s*(lab)([^a-z]|$)")
+_LAB_LECTURE = re.compile(r"(^|[^a-z])(lab)/(lec|lecture)([^a-z]|$)")
+_LAB_AND_LECTURE = re.compile(r"(^|[^a-z])(lab)(and|&|/)\s*(lecture)([^a-z]|$)")
+
+
+def normalize_section_type(raw):
+    """Port of normalizeSectionType in app/utils/normalize.ts; untyped sections map to ''."""
+    t = (raw or "").strip().lower()
+    if not t:
+        return ""
+    if t in ("disc", "dis", "discussion"):
+        return "discussion"
+    if t in ("lec", "lecture"):
+        return "lecture"
+    if t == "lab":
+        return "lab"
+    # Composite types like "lecture/lab", "lec/lab", "lecture & lab"
+    composite = re.sub(r"\s+", "", t)
+    if _LECTURE_LAB.search(composite) or _LECTURE_AND_LAB.search(t):
+        return "lecture"
+    if _LAB_LECTURE.search(composite) or _LAB_AND_LECTURE.search(t):
+        return "lecture"
+    return t
+
+
+def meetings_bitset(meetings):
+    """Weekly bitset of [dayMask, start, end] meetings; bit day*1440+minute is busy."""
+    bits = 0
+    for day_mask, start, end in meetings or []:
+        # Meetings past midnight are cut at the end of their day rather than spilling into the next
+        start, end = max(0, start), min(end, MINUTES_PER_DAY)
+        if end <= start:
+            continue
+        block = ((1 << (end - start)) - 1) << start
+        for day in range(7):
+            if day_mask & (1 << day):
+                bits |= block << (day * MINUTES_PER_DAY)
+    return bits
+
+
+class SectionTimeIndex:
+    """
+    course code -> component type -> [options], where each option is
+    (bitset, [sections meeting at exactly those times]).
+    """
+
+    def __init__(self):
+        self._components = {}
+
+    @classmethod
+    def from_courses(cls, courses_by_school):
+        index = cls()
+        seen = set()
+        staged = defaultdict(lambda: defaultdict(dict))
+        for by_program in (courses_by_school or {}).values():
+            for course_list in (by_program or {}).values():
+                for course in course_list or []:
+                    code = (course.get("courseCode") or "").strip().upper()
+                    if not code:
+                        continue
+                    for section in course.get("sections") or []:
+                        section_code = section.get("sectionCode")
+                        if not section_code or (code, section_code) in seen:
+                            continue
+                        seen.add((code, section_code))
+                        component = normalize_section_type(section.get("type"))
+                        bits = meetings_bitset(section.get("meetings"))
+                        staged[code][component].setdefault(bits, []).append({
+                            "courseCode": code,
+                            "sectionCode": section_code,
+                            "type": component,
+                            "meetings": section.get("meetings") or [],
+                            "instructors": section.get("instructors") or [],
+                        })
+        for code, components in staged.items():
+            index._components[code] = {
+                component: list(options.items()) for component, options in components.items()
+            }
+        return index
+
+    def __contains__(self, code):
+        return code.strip().upper() in self._components
+
+    def components(self, code):
+        return self._components.get(code.strip().upper(), {})
+
+
+def _day_usage(bits):
+    days = 0
+    for day in range(7):
+        if (bits >> (day * MINUTES_PER_DAY)) & DAY_BITS:
+            days |= 1 << day
+    return days
+
+
+def idle_minutes(bits):
+    """Minutes between the first and last class of each day that are not spent in class."""
+    idle = 0
+    for day in range(7):
+        day_bits = (bits >> (day * MINUTES_PER_DAY)) & DAY_BITS
+        if not day_bits:
+            continue
+        low = (day_bits & -day_bits).bit_length() - 1
+        span = day_bits.bit_length() - low
+        idle += span - day_bits.bit_count()
+    return idle
+
+
+def enumerate_schedules(index, course_codes, top=10, max_results=None, max_nodes=DEFAULT_MAX_NODES, stats=None):
+    """
+    Return up to `top` conflict-free schedules for `course_codes`, best first:
+    fewest days on campus, then least idle time between classes. Each schedule
+    lists one chosen section per component plus the sections that meet at the
+    same times as alternatives.
+
+    The search always branches on the component with the fewest options still
+    compatible with the partial schedule (forward checking drops conflicting
+    options and backtracks as soon as a component has none left), tries options
+    that add the fewest new days first, and abandons a branch once its lower
+    bound on days exceeds the worst schedule kept. `max_results` (conflict-free
+    schedules seen) and `max_nodes` (partial schedules expanded) are early
+    cut-offs; when one triggers, `stats["complete"]` is False and the result is
+    the best found so far. Raises KeyError for codes missing from the index.
+    """
+    slots = []
+    for code in course_codes:
+        if code not in index:
+            raise KeyError(f"Unknown course code: {code}")
+        for options in index.components(code).values():
+            slots.append([(bits, _day_usage(bits), sections) for bits, sections in options])
+
+    stats = stats if stats is not None else {}
+    stats.update({"nodes": 0, "schedules": 0, "complete": True})
+    heap = []  # (-days, -idle, tiebreak, chosen options) with the worst schedule on top
+    chosen = []
+
+    def stop():
+        if max_results is not None and stats["schedules"] >= max_results:
+            return True
+        if max_nodes is not None and stats["nodes"] >= max_nodes:
+            return True
+        return False
+
+    def search(bits, day_mask, remaining):
+        if stop():
+            stats["complete"] = False
+            return
+        stats["nodes"] += 1
+        if not remaining:
+            stats["schedules"] += 1
+            entry = (-day_mask.bit_count(), -idle_minutes(bits), -stats["schedules"], list(chosen))
+            if len(heap) < top:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+            return
+        if len(heap) >= top:
+            worst_days = -heap[0][0]
+            lower_bound = max(min((day_mask | d).bit_count() for _, d, _ in opts) for opts in remaining)
+            if lower_bound > worst_days:
+                return
+        position = min(range(len(remaining)), key=lambda i: len(remaining[i]))
+        others = remaining[:position] + remaining[position + 1:]
+        candidates = sorted(remaining[position], key=lambda option: (day_mask | option[1]).bit_count())
+        for option_bits, option_days, sections in candidates:
+            next_bits = bits | option_bits
+            next_remaining = []
+            for opts in others:
+                compatible = [option for option in opts if not option[0] & next_bits]
+                if not compatible:
+                    break
+                next_remaining.append(compatible)
+            else:
+                chosen.append(sections)
+                search(next_bits, day_mask | option_days, next_remaining)
+                chosen.pop()
+
+    if top > 0 and slots and all(slots):
+        search(0, 0, slots)
+
+    results = []
+    for neg_days, neg_idle, _, picks in sorted(heap, reverse=True):
+        results.append({
+            "days": -neg_days,
+            "idleMinutes": -neg_idle,
+            "sections": [
+                {**sections[0], "alternatives": [s["sectionCode"] for s in sections[1:]]}
+                for sections in picks
+            ],
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enumerate conflict-free schedules for a set of courses")
+    parser.add_argument("courses", help="Path to a term's courses.json")
+    parser.add_argument("codes", nargs="+", help="Course codes, e.g. CSCI-103 MATH-226")
+    parser.add_argument("--top", type=int, default=10, help="Number of best schedules to return")
+    parser.add_argument("--max-results", type=int, default=None, help="Stop after this many conflict-free schedules")
+    parser.add_argument(
+        "--max-nodes",
+        type=int,
+        default=DEFAULT_MAX_NODES,
+        help="Stop after expanding this many partial schedules (0 for an exhaustive search)",
+    )
+    parser.add_argument("--benchmark", action="store_true", help="Print index build and search timings to stderr")
+    args = parser.parse_args()
+
+    with open(args.courses, "r", encoding="utf-8") as f:
+        courses_by_school = json.load(f)
+
+    started = time.perf_counter()
+    index = SectionTimeIndex.from_courses(courses_by_school)
+    indexed = time.perf_counter()
+    stats = {}
+    schedules = enumerate_schedules(
+        index,
+        args.codes,
+        top=args.top,
+        max_results=args.max_results,
+        max_nodes=args.max_nodes or None,
+        stats=stats,
+    )
+    finished = time.perf_counter()
+
+    print(json.dumps(schedules, ensure_ascii=False, indent=2))
+    if args.benchmark:
+        print(
+            f"index {1000 * (indexed - started):.1f} ms, search {1000 * (finished - indexed):.1f} ms, "
+            f"{stats['nodes']} nodes, {stats['schedules']} conflict-free schedules seen, "
+            f"search {'complete' if stats['complete'] else 'cut off'}",
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Prebuilt trigram search index for the course list.
+
+For every de-duplicated UI course (see course_index.py) this rebuilds the same
+lower-cased haystack that `courseMatchesSearch` in
+app/composables/filters/search.ts scans: title, code, description, the
+`GE-A` / `GE A` / `GESM` synonyms and every section's id, instructors,
+schedule, location, units and type. Each distinct ASCII trigram of the haystack
+maps to the sorted ids of the courses containing it, stored delta-encoded.
+
+Program views build their own per-program variant of a course (see
+getSchoolCourses in app/composables/api/queries.ts), so the trigrams of those
+variants are indexed under the same course too. A query of three or more
+characters then only needs the intersection of its trigrams' posting lists; the
+client confirms the (few) candidates with the original substring check.
+
+Only ASCII trigrams are indexed, and the client falls back to the full scan for
+any query with a non-ASCII character. Python lowers and slices by code point
+while the browser lowers and slices UTF-16 units, so the two can disagree on
+non-ASCII text; three ASCII characters are the same trigram on both sides. For
+ASCII queries the candidates therefore cover every course the full scan
+matches, as long as Python's and the browser's Unicode case tables agree on
+which characters lower to ASCII (the Kelvin sign to "k", for example).
+
+Run standalone against an existing course index, e.g.:
+    python search_index.py ../public/data/20261/course-index.json ../public/data/20261/search-index.json \
+        --courses ../public/data/20261/courses.json
+"""
+
+import argparse
+import json
+from bisect import bisect_left
+from decimal import ROUND_HALF_UP, Decimal
+
+from course_index import map_grouped_course, merge_sections_by_id
+
+SEARCH_INDEX_VERSION = 1
+GRAM_SIZE = 3
+
+
+def _to_fixed_1(value):
+    """Number(value).toFixed(1): round half up on the exact binary value."""
+    return str(Decimal(float(value)).quantize(Decimal("0.1"), rounding=ROUND_HALF_UP))
+
+
+def course_key(course):
+    """`${normalizeCourseCode(code)}::${title.trim().toUpperCase()}`, the client's merge key."""
+    return f"{(course.get('code') or '').strip().upper()}::{(course.get('title') or '').strip().upper()}"
+
+
+def course_haystack(course):
+    """Python twin of the haystack built by courseMatchesSearch."""
+    section_strings = []
+    for section in course.get("sections") or []:
+        units = section.get("units")
+        parts = [
+            section.get("sectionId"),
+            *(section.get("instructors") or []),
+            section.get("schedule"),
+            section.get("location"),
+            _to_fixed_1(units) if units is not None else "",
+            section.get("type") or "",
+        ]
+        section_strings.extend(str(p) for p in parts if p)
+    ge_letters = [g for g in dict.fromkeys(course.get("ge") or []) if g]
+    ge_tokens = [token for g in ge_letters for token in (f"GE-{g}", f"GE {g}")]
+    gesm_tokens = ["GESM", "GESM-"] if (course.get("code") or "").upper().startswith("GESM") else []
+    return " ".join(
+        [course.get("title") or "", course.get("code") or "", course.get("description") or ""]
+        + ge_tokens
+        + gesm_tokens
+        + section_strings
+    ).lower()
+
+
+def trigrams(text):
+    """The ASCII trigrams of `text`; queries containing anything else skip the index."""
+    return {gram for gram in (text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)) if gram.isascii()}
+
+
+def iter_program_variants(courses_by_school):
+    """Yield the per-program UI courses exactly as getSchoolCourses merges them."""
+    for by_program in (courses_by_school or {}).values():
+        for course_list in (by_program or {}).values():
+            by_key = {}
+            for raw in course_list or []:
+                mapped = map_grouped_course(raw)
+                if not mapped:
+                    continue
+                key = course_key(mapped)
+                existing = by_key.get(key)
+                if existing is None:
+                    by_key[key] = mapped
+                else:
+                    by_key[key] = {
+                        "title": existing["title"] or mapped["title"],
+                        "code": existing["code"] or mapped["code"],
+                        "description": existing["description"] or mapped["description"],
+                        "sections": merge_sections_by_id(existing["sections"], mapped["sections"]),
+                    }
+            yield from by_key.values()
+
+
+def build_search_index(ui_courses, courses_by_school=None, term=None):
+    """Build {keys, grams} from the course index's de-duplicated UI courses and their program variants."""
+    keys = []
+    ids_by_key = {}
+    # gram -> sorted, distinct course ids; filled directly so no per-course gram sets are kept
+    postings = {}
+
+    def add_postings(course_id, course_grams):
+        for gram in course_grams:
+            ids = postings.get(gram)
+            if ids is None:
+                postings[gram] = [course_id]
+            elif ids[-1] < course_id:
+                ids.append(course_id)
+            else:
+                # Program variants revisit courses whose ids were already passed
+                position = bisect_left(ids, course_id)
+                if position == len(ids) or ids[position] != course_id:
+                    ids.insert(position, course_id)
+
+    for course in ui_courses or []:
+        key = course_key(course)
+        ids_by_key[key] = len(keys)
+        keys.append(key)
+        add_postings(ids_by_key[key], trigrams(course_haystack(course)))
+    for variant in iter_program_variants(courses_by_school):
+        course_id = ids_by_key.get(course_key(variant))
+        if course_id is not None:
+            add_postings(course_id, trigrams(course_haystack(variant)))
+
+    grams = {}
+    for gram in sorted(postings):
+        ids = postings[gram]
+        # ids are appended in increasing order; store gaps to keep the numbers small
+        previous = 0
+        deltas = []
+        for course_id in ids:
+            deltas.append(course_id - previous)
+            previous = course_id
+        grams[gram] = deltas
+
+    return {
+        "version": SEARCH_INDEX_VERSION,
+        "term": term,
+        "gramSize": GRAM_SIZE,
+        "keys": keys,
+        "grams": grams,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the trigram search index from a course index")
+    parser.add_argument("course_index", help="Path to a term's course-index.json")
+    parser.add_argument("output", help="Where to write the search index")
+    parser.add_argument("--courses", default=None, help="The term's courses.json, to also index per-program variants")
+    args = parser.parse_args()
+
+    with open(args.course_index, "r", encoding="utf-8") as f:
+        course_index = json.load(f)
+    courses_by_school = None
+    if args.courses:
+        with open(args.courses, "r", encoding="utf-8") as f:
+            courses_by_school = json.load(f)
+    index = build_search_index(course_index.get("courses"), courses_by_school, term=course_index.get("term"))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+
+
+if __name__ == "__main__":
+    main()
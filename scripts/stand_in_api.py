@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the classes.usc.edu API, for testing generate-test-data.py
+without the network.
+
+Serves a small deterministic catalog on the three endpoints the generator uses
+(Schools/TermCode, Courses/CoursesByTermSchoolProgram, Courses/GeCoursesByTerm),
+with ETags so conditional requests and the response cache are exercised too.
+The catalog covers lectures with discussions and labs, a course listed under a
+GE category, and the GESM seminar.
+
+Example:
+    python stand_in_api.py --port 8765
+    python generate-test-data.py --api-base http://127.0.0.1:8765/api --no-cache
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+SCHOOLS = [
+    {"name": "Engineering", "prefix": "ENGR", "programs": [{"name": "Computer Science", "prefix": "CSCI"}, {"name": "Electrical Engineering", "prefix": "EE"}]},
+    {"name": "Dornsife", "prefix": "LAS", "programs": [{"name": "Mathematics", "prefix": "MATH"}, {"name": "Writing", "prefix": "WRIT"}]},
+]
+
+# (program, number, title, [(section id, rnrMode, days, start, end, instructor)])
+CATALOG = [
+    ("CSCI", 103, "Introduction to Programming", [
+        ("29901", "Lecture", ["Mon", "Wed"], "10:00", "11:50", ("Ann", "Lee")),
+        ("29902", "Lab", ["Tue"], "14:00", "15:50", ("Ann", "Lee")),
+        ("29903", "Lab", ["Thu"], "14:00", "15:50", ("Raj", "Patel")),
+    ]),
+    ("CSCI", 104, "Data Structures and Object Oriented Design", [
+        ("30001", "Lecture/Lab", ["Tue", "Thu"], "12:30", "13:50", ("Mark", "Redekopp")),
+    ]),
+    ("EE", 101, "Introduction to Digital Logic", [
+        ("31001", "Lecture", ["Fri"], "9:00", "11:50", ("Gandhi", "Puvvada")),
+        ("31002", "Discussion", ["Mon"], "17:00", "17:50", ("Gandhi", "Puvvada")),
+    ]),
+    ("MATH", 226, "Calculus III", [
+        ("39001", "Lecture", ["Mon", "Wed", "Fri"], "10:00", "10:50", ("Sami", "Assaf")),
+        ("39002", "Discussion", ["Tue", "Thu"], "9:00", "9:50", ("Sami", "Assaf")),
+        ("39003", "Discussion", ["Tue", "Thu"], "9:00", "9:50", ("Sami", "Assaf")),
+    ]),
+    ("WRIT", 150, "Writing and Critical Reasoning", [
+        ("66001", "Lecture", ["Tue", "Thu"], "8:00", "9:20", ("Bob", "Ray")),
+    ]),
+]
+
+# GE category prefix -> courses of CATALOG (by program and number) listed under it
+GE_CATEGORIES = {
+    "ARTS": [("WRIT", 150)],
+    "HINQ": [("CSCI", 103)],
+    "QREA": [("MATH", 226)],
+}
+GESM_COURSES = [
+    ("GESM", 110, "Seminar in Humanistic Inquiry", [
+        ("35001", "Lecture", ["Mon"], "12:00", "13:50", ("Emily", "Anderson")),
+    ]),
+]
+
+
+def _course(program, number, title, sections):
+    code = {"prefix": program, "courseHyphen": f"{program}-{number}", "courseSpace": f"{program} {number}"}
+    return {
+        "scheduledCourseCode": code,
+        "publishedCourseCode": code,
+        "matchedCourseCode": code,
+        "name": title,
+        "description": f"{title}.",
+        "duplicateCredit": None,
+        "prerequisiteCourseCodes": [],
+        "sections": [
+            {
+                "sisSectionId": section_id,
+                "name": None,
+                "isCancelled": False,
+                "units": ["4.0"],
+                "totalSeats": 40,
+                "registeredSeats": int(section_id) % 40,
+                "hasDClearance": False,
+                "rnrMode": mode,
+                "instructors": [{"firstName": first, "lastName": last}],
+                "schedule": [{"days": days, "dayCode": "", "startTime": start, "endTime": end, "location": "THH 101"}],
+            }
+            for section_id, mode, days, start, end, (first, last) in sections
+        ],
+    }
+
+
+def program_courses(program):
+    return [_course(*entry) for entry in CATALOG if entry[0] == program]
+
+
+def ge_courses(category_prefix):
+    if category_prefix == "GESM":
+        return [_course(*entry) for entry in GESM_COURSES]
+    listed = set(GE_CATEGORIES.get(category_prefix, ()))
+    return [_course(*entry) for entry in CATALOG if (entry[0], entry[1]) in listed]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = dict(parse_qsl(url.query))
+        if url.path.endswith("/Schools/TermCode"):
+            payload = SCHOOLS
+        elif url.path.endswith("/Courses/CoursesByTermSchoolProgram"):
+            payload = {"courses": program_courses(query.get("program"))}
+        elif url.path.endswith("/Courses/GeCoursesByTerm"):
+            payload = {"courses": ge_courses(query.get("categoryPrefix"))}
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = json.dumps(payload).encode("utf-8")
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_server(port=0):
+    """Serve on 127.0.0.1 from a daemon thread; returns (server, API base URL)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a stand-in classes API for generate-test-data.py")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), StandInHandler)
+    print(f"Serving the stand-in API at http://127.0.0.1:{args.port}/api")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Largest-first (LPT) ordering of the generator's program fetch jobs.
+
+How long each program took (fetch plus processing) and how many upstream
+courses its payload held are persisted between runs. The next run submits the
+programs with the longest expected duration first, so a few huge programs can
+no longer start last and set the makespan while the other workers sit idle.
+Programs without history are estimated at the median known duration.
+"""
+
+import json
+import logging
+import os
+import statistics
+import threading
+
+PROGRAM_STATS_VERSION = 1
+# Weight of the latest run in the smoothed duration; damps one-off slow fetches
+SMOOTHING = 0.5
+
+
+def _stats_key(target):
+    school_prefix, program_prefix = target
+    return f"{school_prefix}/{program_prefix}"
+
+
+def predict_makespan(durations, workers):
+    """Makespan of handing `durations`, in order, to whichever of `workers` frees up first."""
+    finish_times = [0.0] * max(1, workers)
+    for duration in durations:
+        earliest = min(range(len(finish_times)), key=finish_times.__getitem__)
+        finish_times[earliest] += duration
+    return max(finish_times)
+
+
+class ProgramStats:
+    """Per-program {"seconds", "courses", "runs"} from previous runs, keyed on (school, program)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._programs = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable program stats: {e}")
+            return
+        if state.get("version") == PROGRAM_STATS_VERSION:
+            self._programs = state.get("programs") or {}
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            state = {"version": PROGRAM_STATS_VERSION, "programs": dict(sorted(self._programs.items()))}
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+
+    def record(self, target, seconds, courses):
+        """Fold one program's duration and payload size into its history; safe to call from workers."""
+        key = _stats_key(target)
+        with self._lock:
+            previous = self._programs.get(key)
+            if previous is not None:
+                seconds = SMOOTHING * seconds + (1 - SMOOTHING) * float(previous.get("seconds") or 0)
+            self._programs[key] = {
+                "seconds": round(seconds, 3),
+                "courses": courses,
+                "runs": (previous or {}).get("runs", 0) + 1,
+            }
+
+    def known(self, target):
+        return _stats_key(target) in self._programs
+
+    def estimates(self, targets):
+        """Expected seconds per target, using the median known duration for programs without history."""
+        known = [float(entry.get("seconds") or 0) for entry in self._programs.values()]
+        fallback = statistics.median(known) if known else 0.0
+        estimates = []
+        for target in targets:
+            entry = self._programs.get(_stats_key(target))
+            estimates.append(float(entry.get("seconds") or 0) if entry is not None else fallback)
+        return estimates
+
+    def order(self, targets):
+        """Targets sorted longest expected duration first; ties keep their listing order."""
+        targets = list(targets)
+        estimates = self.estimates(targets)
+        positions = sorted(range(len(targets)), key=lambda i: -estimates[i])
+        return [targets[i] for i in positions]